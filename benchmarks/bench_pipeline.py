@@ -0,0 +1,121 @@
+"""End-to-end offline benchmark of the newsletter pipeline.
+
+Usage:
+    python -m benchmarks.bench_pipeline [--counts 10 100 1000] [--summarizer stub|model]
+                                        [--mode pipeline|serial] [--latency-ms 50]
+                                        [--failure-rate 0.05] [--json results.json]
+
+A local server serves fixture feeds and article pages.  For each article
+count the harness runs fetch_instapaper_articles, then either the streaming
+pipeline or process_article per article, then save_to_db and
+export_to_markdown, with the Tk picker bypassed (every candidate is
+selected).  Each run uses a fresh database and export directory.
+Throughput and per-stage p50/p95 latency are reported.
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+
+from config import SUMMARY_MAX_WORDS
+from newsletter import metrics
+from newsletter.db import save_to_db
+from newsletter.pipeline import run_pipeline
+from newsletter.rss import fetch_instapaper_articles
+from newsletter.summarize import export_to_markdown, process_article
+from benchmarks.fixtures import FixtureServer
+from benchmarks.stub_summarizer import StubSummarizer, ReadyLoader
+
+def build_summarizer(kind, stub_token_ms):
+    if kind == "stub":
+        summarizer = StubSummarizer(seconds_per_token=stub_token_ms / 1000.0)
+        return summarizer, summarizer.tokenizer
+    from newsletter.summarize import detect_device, get_summarizer_and_tokenizer
+    return get_summarizer_and_tokenizer(detect_device())
+
+def run_once(count, args, summarizer, tokenizer):
+    workdir = tempfile.mkdtemp(prefix="newsletter-bench-")
+    db_path = os.path.join(workdir, "bench.sqlite3")
+    server = FixtureServer(
+        count,
+        num_feeds=args.feeds,
+        latency=args.latency_ms / 1000.0,
+        jitter=args.jitter_ms / 1000.0,
+        failure_rate=args.failure_rate,
+        stall_rate=args.stall_rate,
+        seed=args.seed,
+    )
+    metrics.reset()
+    started = time.perf_counter()
+    try:
+        with server:
+            articles = fetch_instapaper_articles(server.feed_urls, db_path, count)
+            if args.mode == "pipeline":
+                records = run_pipeline(articles, ReadyLoader(summarizer, tokenizer), db_path, SUMMARY_MAX_WORDS)
+            else:
+                records = []
+                for art in articles:
+                    with metrics.span("article"):
+                        rec = process_article(art, summarizer, tokenizer, SUMMARY_MAX_WORDS, db_path=db_path)
+                    if rec:
+                        records.append(rec)
+                save_to_db(db_path, records)
+            with metrics.span("export"):
+                export_to_markdown(records, workdir)
+        wall = time.perf_counter() - started
+    finally:
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+    snap = metrics.snapshot()
+    return {
+        "count": count,
+        "candidates": len(articles),
+        "processed": len(records),
+        "wall_seconds": wall,
+        "articles_per_second": len(records) / wall if wall > 0 else 0.0,
+        "stages": snap["stages"],
+        "counters": snap["counters"],
+        "requests": server.requests,
+        "workdir": workdir if args.keep else None,
+    }
+
+def print_result(result):
+    print(f"\n{result['count']} articles: {result['processed']}/{result['candidates']} processed in "
+          f"{result['wall_seconds']:.2f}s ({result['articles_per_second']:.2f} articles/sec, "
+          f"{result['requests']} HTTP requests)")
+    print(f"  {'stage':<16}{'count':>7}{'total s':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for stage, st in sorted(result["stages"].items(), key=lambda kv: -kv[1]["total"]):
+        print(f"  {stage:<16}{st['count']:>7}{st['total']:>10.2f}{st['p50'] * 1000:>10.1f}{st['p95'] * 1000:>10.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--counts", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--summarizer", choices=["stub", "model"], default="stub")
+    parser.add_argument("--stub-token-ms", type=float, default=0.0,
+                        help="Simulated generation cost per output token for the stub summarizer")
+    parser.add_argument("--mode", choices=["pipeline", "serial"], default="pipeline")
+    parser.add_argument("--feeds", type=int, default=4)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--stall-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--keep", action="store_true", help="Keep each run's database and markdown export")
+    parser.add_argument("--json", help="Write all results to this file")
+    args = parser.parse_args()
+
+    summarizer, tokenizer = build_summarizer(args.summarizer, args.stub_token_ms)
+    results = []
+    for count in args.counts:
+        result = run_once(count, args, summarizer, tokenizer)
+        print_result(result)
+        results.append(result)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+        print(f"Wrote results to {args.json}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Compare summarizer inference backends on a fixed local corpus.
+
+Usage:
+    python -m benchmarks.compare_backends [--backends torch torch-int8 onnx]
+                                          [--corpus benchmarks/corpus] [--json out.json]
+
+The first backend is the quality reference; the others are scored against
+its summaries with ROUGE-1/2/L F1.  Every backend summarizes through
+summarize_records, the pipeline's own path.  Load time and per-article
+latency (mean, p50, p95) are reported for each backend.
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+
+from newsletter.summarize import INFERENCE_BACKENDS, get_summarizer_and_tokenizer
+from config import SUMMARY_MAX_WORDS, NUM_BEAMS
+from newsletter.metrics import percentile
+from benchmarks.quality import load_corpus, rouge_scores, summarize_corpus
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(__file__), "corpus")
+
+def run_backend(backend, corpus, summary_max_words, num_beams):
+    started = time.perf_counter()
+    summarizer, _ = get_summarizer_and_tokenizer(-1, backend=backend)
+    load_seconds = time.perf_counter() - started
+    latencies, summaries = summarize_corpus(corpus, summarizer, summary_max_words, num_beams)
+    return {
+        "backend": backend,
+        "load_seconds": load_seconds,
+        "latency_mean": statistics.mean(latencies) if latencies else 0.0,
+        "latency_p50": percentile(latencies, 50),
+        "latency_p95": percentile(latencies, 95),
+        "summaries": summaries,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backends", nargs="+", default=list(INFERENCE_BACKENDS), choices=INFERENCE_BACKENDS)
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS)
+    parser.add_argument("--max-words", type=int, default=SUMMARY_MAX_WORDS)
+    parser.add_argument("--num-beams", type=int, default=NUM_BEAMS)
+    parser.add_argument("--json", help="Write the full results, including summaries, to this file")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    if not corpus:
+        parser.error(f"No .txt files found in {args.corpus}")
+    results = [run_backend(b, corpus, args.max_words, args.num_beams) for b in args.backends]
+    reference = results[0]
+    for result in results:
+        scores = [rouge_scores(result["summaries"][name], reference["summaries"][name]) for name, _ in corpus]
+        for metric in ("rouge1", "rouge2", "rougeL"):
+            result[metric] = statistics.mean(s[metric] for s in scores)
+
+    print(f"{len(corpus)} articles, reference backend: {reference['backend']}")
+    print(f"{'backend':<12}{'load s':>9}{'mean s':>9}{'p50 s':>9}{'p95 s':>9}{'R-1':>7}{'R-2':>7}{'R-L':>7}")
+    for r in results:
+        print(f"{r['backend']:<12}{r['load_seconds']:>9.1f}{r['latency_mean']:>9.2f}{r['latency_p50']:>9.2f}"
+              f"{r['latency_p95']:>9.2f}{r['rouge1']:>7.3f}{r['rouge2']:>7.3f}{r['rougeL']:>7.3f}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Wrote results to {args.json}")
+
+if __name__ == "__main__":
+    main()
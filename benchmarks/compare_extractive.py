@@ -0,0 +1,119 @@
+"""Compare the extractive summarizers with the abstractive model on a fixed local corpus.
+
+Usage:
+    python -m benchmarks.compare_extractive [--methods textrank tfidf lead]
+                                            [--no-model] [--repeat 20] [--json out.json]
+
+The model (MODEL_NAME on INFERENCE_BACKEND) is the quality reference; the
+extractive methods are scored against its summaries with ROUGE-1/2/L F1.
+"lead" (the opening sentences) is included as a baseline.  The model and
+the extractive methods both run through summarize_records, with
+SUMMARY_MODE switched, so they are timed on the pipeline's own path.
+With --no-model only extractive throughput is measured.  Per-article latency (mean, p50,
+p95) and articles/sec are reported for every method.
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+
+from config import SUMMARY_MAX_WORDS, NUM_BEAMS
+from newsletter import extractive
+from newsletter.extractive import EXTRACTIVE_METHODS, split_sentences
+from newsletter.metrics import percentile
+from benchmarks.quality import load_corpus, rouge_scores, summarize_corpus
+from benchmarks.stub_summarizer import StubSummarizer
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(__file__), "corpus")
+
+def lead_summary(text, max_words):
+    chosen = []
+    used = 0
+    for sentence in split_sentences(text):
+        words = len(sentence.split())
+        if chosen and used + words > max_words:
+            break
+        chosen.append(sentence)
+        used += words
+    return " ".join(chosen)
+
+def _report(method, latencies, summaries):
+    mean = statistics.mean(latencies) if latencies else 0.0
+    return {
+        "method": method,
+        "latency_mean": mean,
+        "latency_p50": percentile(latencies, 50),
+        "latency_p95": percentile(latencies, 95),
+        "articles_per_second": 1.0 / mean if mean > 0 else 0.0,
+        "summaries": summaries,
+    }
+
+def run_extractive(method, corpus, summary_max_words, repeat):
+    if method == "lead":
+        summaries = {}
+        latencies = []
+        for name, text in corpus:
+            # Extractive runs take milliseconds; repeat them for a stable timing
+            t0 = time.perf_counter()
+            for _ in range(repeat):
+                summary = lead_summary(text, summary_max_words)
+            latencies.append((time.perf_counter() - t0) / repeat)
+            summaries[name] = summary
+        return _report(method, latencies, summaries)
+    # The extractive tier ignores the model; the stub only supplies a tokenizer for the records
+    saved = extractive.EXTRACTIVE_METHOD
+    extractive.EXTRACTIVE_METHOD = method
+    try:
+        latencies, summaries = summarize_corpus(corpus, StubSummarizer(), summary_max_words,
+                                                summary_mode="extractive", repeat=repeat)
+    finally:
+        extractive.EXTRACTIVE_METHOD = saved
+    return _report(method, latencies, summaries)
+
+def run_model(corpus, summary_max_words, num_beams):
+    from newsletter.summarize import INFERENCE_BACKEND, get_summarizer_and_tokenizer
+    summarizer, _ = get_summarizer_and_tokenizer(-1)
+    latencies, summaries = summarize_corpus(corpus, summarizer, summary_max_words, num_beams)
+    return _report(f"model:{INFERENCE_BACKEND}", latencies, summaries)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--methods", nargs="+", default=list(EXTRACTIVE_METHODS) + ["lead"],
+                        choices=list(EXTRACTIVE_METHODS) + ["lead"])
+    parser.add_argument("--no-model", action="store_true", help="Skip the abstractive model (no quality scores)")
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS)
+    parser.add_argument("--max-words", type=int, default=SUMMARY_MAX_WORDS)
+    parser.add_argument("--num-beams", type=int, default=NUM_BEAMS)
+    parser.add_argument("--repeat", type=int, default=20, help="Timing repetitions per article for extractive methods")
+    parser.add_argument("--json", help="Write the full results, including summaries, to this file")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    if not corpus:
+        parser.error(f"No .txt files found in {args.corpus}")
+    results = []
+    if not args.no_model:
+        results.append(run_model(corpus, args.max_words, args.num_beams))
+    results.extend(run_extractive(m, corpus, args.max_words, max(1, args.repeat)) for m in args.methods)
+    reference = results[0] if not args.no_model else None
+    for result in results:
+        if reference is None:
+            continue
+        scores = [rouge_scores(result["summaries"][name], reference["summaries"][name]) for name, _ in corpus]
+        for metric in ("rouge1", "rouge2", "rougeL"):
+            result[metric] = statistics.mean(s[metric] for s in scores)
+
+    print(f"{len(corpus)} articles" + (f", reference: {reference['method']}" if reference else ""))
+    print(f"{'method':<14}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'art/s':>10}{'R-1':>7}{'R-2':>7}{'R-L':>7}")
+    for r in results:
+        quality = "".join(f"{r[m]:>7.3f}" if m in r else f"{'-':>7}" for m in ("rouge1", "rouge2", "rougeL"))
+        print(f"{r['method']:<14}{r['latency_mean'] * 1000:>10.2f}{r['latency_p50'] * 1000:>10.2f}"
+              f"{r['latency_p95'] * 1000:>10.2f}{r['articles_per_second']:>10.1f}{quality}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Wrote results to {args.json}")
+
+if __name__ == "__main__":
+    main()
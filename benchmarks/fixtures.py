@@ -0,0 +1,169 @@
+"""Local HTTP server serving fixture RSS feeds and article pages for benchmarks.
+
+Feeds are served at /feed/<n>.xml and articles at /article/<i>.html.  All
+content is generated deterministically from the article index, so runs are
+reproducible.  Latency and failures can be injected per request.
+"""
+import datetime
+import hashlib
+import random
+import threading
+import time
+from email.utils import format_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from xml.sax.saxutils import escape
+
+WORDS = (
+    "city council budget plan vote transit water school report state federal market company "
+    "workers energy storage battery drought farmers library hours hospital housing rent court "
+    "ruling policy climate research study data officials residents community program funding "
+    "growth election campaign season team league museum exhibit festival river bridge road"
+).split()
+
+PUBLICATIONS = ["The Daily Fixture", "Local Ledger", "Benchmark Times", "Synthetic Post", "Replay Herald"]
+
+def _rng(*parts):
+    seed = hashlib.sha256(":".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+    return random.Random(int(seed[:16], 16))
+
+def article_title(i):
+    rng = _rng("title", i)
+    return f"{rng.choice(WORDS).title()} {rng.choice(WORDS)} {rng.choice(WORDS)} update {i}"
+
+def article_text(i, min_words=150, max_words=1500):
+    rng = _rng("text", i)
+    target = rng.randint(min_words, max_words)
+    paragraphs = []
+    words = 0
+    while words < target:
+        sentences = []
+        for _ in range(rng.randint(3, 6)):
+            length = rng.randint(8, 24)
+            sentence = " ".join(rng.choice(WORDS) for _ in range(length))
+            sentences.append(sentence[0].upper() + sentence[1:] + ".")
+            words += length
+        paragraphs.append(" ".join(sentences))
+    return paragraphs
+
+def article_html(i, base_url):
+    publication = PUBLICATIONS[i % len(PUBLICATIONS)]
+    body = "\n".join(f"<p>{escape(p)}</p>" for p in article_text(i))
+    return f"""<!DOCTYPE html>
+<html><head>
+<meta charset="utf-8">
+<title>{escape(article_title(i))} | {publication}</title>
+<meta property="og:site_name" content="{publication}">
+<meta name="author" content="Fixture Author {i % 7}">
+<link rel="canonical" href="{base_url}/article/{i}.html">
+</head><body>
+<article>
+<h1>{escape(article_title(i))}</h1>
+<p class="byline">By Fixture Author {i % 7}</p>
+{body}
+</article>
+</body></html>"""
+
+def feed_xml(feed, num_feeds, num_articles, base_url, now=None):
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    items = []
+    for i in range(feed, num_articles, num_feeds):
+        published = now - datetime.timedelta(minutes=i)
+        items.append(f"""<item>
+<title>{escape(article_title(i))}</title>
+<link>{base_url}/article/{i}.html</link>
+<guid>{base_url}/article/{i}.html</guid>
+<pubDate>{format_datetime(published)}</pubDate>
+</item>""")
+    return f"""<?xml version="1.0" encoding="UTF-8"?>
+<rss version="2.0"><channel>
+<title>Fixture feed {feed}</title>
+<link>{base_url}/</link>
+<description>Benchmark fixture feed</description>
+{"".join(items)}
+</channel></rss>"""
+
+class FixtureServer:
+    """Serve fixture feeds and articles on 127.0.0.1 from a background thread.
+
+    ``latency`` (seconds) and ``jitter`` delay every response; ``failure_rate``
+    answers that fraction of article requests with 503 and ``stall_rate``
+    makes that fraction sleep for ``stall_seconds`` before answering.  The
+    choice of failing articles is deterministic for a given ``seed``.
+    """
+
+    def __init__(self, num_articles, num_feeds=4, latency=0.0, jitter=0.0,
+                 failure_rate=0.0, stall_rate=0.0, stall_seconds=15.0, seed=0):
+        self.num_articles = num_articles
+        self.num_feeds = max(1, num_feeds)
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.stall_rate = stall_rate
+        self.stall_seconds = stall_seconds
+        self.seed = seed
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._httpd.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self._httpd.server_address[1]}"
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="fixture-server", daemon=True)
+
+    @property
+    def feed_urls(self):
+        return [f"{self.base_url}/feed/{n}.xml" for n in range(self.num_feeds)]
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, body, content_type):
+                data = body.encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                with server._lock:
+                    server.requests += 1
+                rng = _rng("request", server.seed, self.path, time.monotonic_ns())
+                delay = server.latency + (rng.uniform(-server.jitter, server.jitter) if server.jitter else 0.0)
+                if delay > 0:
+                    time.sleep(delay)
+                parts = self.path.strip("/").split("/")
+                try:
+                    if len(parts) == 2 and parts[0] == "feed" and parts[1].endswith(".xml"):
+                        feed = int(parts[1][:-4])
+                        body = feed_xml(feed, server.num_feeds, server.num_articles, server.base_url)
+                        return self._send(200, body, "application/rss+xml; charset=utf-8")
+                    if len(parts) == 2 and parts[0] == "article" and parts[1].endswith(".html"):
+                        i = int(parts[1][:-5])
+                        fate = _rng("fate", server.seed, i).random()
+                        if fate < server.failure_rate:
+                            return self._send(503, "Service Unavailable", "text/plain")
+                        if fate < server.failure_rate + server.stall_rate:
+                            time.sleep(server.stall_seconds)
+                        return self._send(200, article_html(i, server.base_url), "text/html; charset=utf-8")
+                except ValueError:
+                    pass
+                self._send(404, "Not Found", "text/plain")
+
+        return Handler
@@ -0,0 +1,95 @@
+"""Summary quality and latency helpers for the benchmarks."""
+import re
+import time
+
+def _tokens(text):
+    return re.findall(r"[a-z0-9']+", text.lower())
+
+def _ngrams(tokens, n):
+    counts = {}
+    for i in range(len(tokens) - n + 1):
+        gram = tuple(tokens[i:i + n])
+        counts[gram] = counts.get(gram, 0) + 1
+    return counts
+
+def _f1(overlap, candidate_total, reference_total):
+    if not overlap or not candidate_total or not reference_total:
+        return 0.0
+    precision = overlap / candidate_total
+    recall = overlap / reference_total
+    return 2 * precision * recall / (precision + recall)
+
+def rouge_n(candidate, reference, n):
+    cand = _ngrams(_tokens(candidate), n)
+    ref = _ngrams(_tokens(reference), n)
+    overlap = sum(min(count, ref.get(gram, 0)) for gram, count in cand.items())
+    return _f1(overlap, sum(cand.values()), sum(ref.values()))
+
+def rouge_l(candidate, reference):
+    cand = _tokens(candidate)
+    ref = _tokens(reference)
+    if not cand or not ref:
+        return 0.0
+    # Longest common subsequence, one row at a time
+    prev = [0] * (len(ref) + 1)
+    for c in cand:
+        row = [0]
+        for j, r in enumerate(ref):
+            row.append(prev[j] + 1 if c == r else max(prev[j + 1], row[j]))
+        prev = row
+    return _f1(prev[-1], len(cand), len(ref))
+
+def rouge_scores(candidate, reference):
+    return {
+        "rouge1": rouge_n(candidate, reference, 1),
+        "rouge2": rouge_n(candidate, reference, 2),
+        "rougeL": rouge_l(candidate, reference),
+    }
+
+def corpus_records(corpus, tokenizer):
+    """Records for the corpus texts, shaped like newsletter.summarize.prepare_article's."""
+    records = []
+    for name, text in corpus:
+        input_ids = tokenizer(text, add_special_tokens=False, truncation=False)["input_ids"]
+        records.append({
+            "headline": name,
+            "body": text,
+            "author": "",
+            "publication_date": "",
+            "publication_name": "",
+            "source": "",
+            "summary": None,
+            "url": name,
+            "input_ids": input_ids,
+            "token_count": len(input_ids),
+        })
+    return records
+
+def summarize_corpus(corpus, summarizer, summary_max_words, num_beams=None, summary_mode="abstractive", repeat=1):
+    """Summarize each text through summarize_records, as the pipeline does; returns (latencies, summaries).
+
+    Each article is its own call, so a latency is one article's time; with
+    ``repeat`` the call is repeated and the mean taken.  The summary cache
+    is not used.
+    """
+    from newsletter.summarize import summarize_records
+    latencies = []
+    summaries = {}
+    for rec in corpus_records(corpus, summarizer.tokenizer):
+        t0 = time.perf_counter()
+        for _ in range(repeat):
+            rec["summary"] = None
+            summarize_records([rec], summarizer, summary_max_words, num_beams=num_beams, batch_size=1,
+                              summary_mode=summary_mode)
+        latencies.append((time.perf_counter() - t0) / repeat)
+        summaries[rec["url"]] = rec["summary"]
+    return latencies, summaries
+
+def load_corpus(corpus_dir):
+    import os
+    texts = []
+    for name in sorted(os.listdir(corpus_dir)):
+        if name.endswith(".txt"):
+            with open(os.path.join(corpus_dir, name), encoding="utf-8") as f:
+                texts.append((name, f.read()))
+    return texts
@@ -0,0 +1,116 @@
+"""A deterministic, dependency-free stand-in for the transformers summarization pipeline.
+
+It implements just the parts of the pipeline, tokenizer and model that
+newsletter.summarize uses, so the full pipeline can be benchmarked without
+torch or model weights.  "Generation" returns the leading tokens of the
+input, optionally sleeping per generated token to mimic model cost.
+"""
+import threading
+import time
+
+BOS, PAD, EOS = 0, 1, 2
+
+class _Ids(list):
+    @property
+    def shape(self):
+        return (len(self), max((len(row) for row in self), default=0))
+
+    def tolist(self):
+        return [list(row) for row in self]
+
+class _Batch(dict):
+    def to(self, device):
+        return self
+
+class StubTokenizer:
+    """Whitespace tokenizer with a vocabulary that grows as words are seen."""
+
+    all_special_ids = [BOS, PAD, EOS]
+    model_max_length = 1024
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._vocab = {"<s>": BOS, "<pad>": PAD, "</s>": EOS}
+        self._words = ["<s>", "<pad>", "</s>"]
+
+    def _id(self, word):
+        with self._lock:
+            token_id = self._vocab.get(word)
+            if token_id is None:
+                token_id = len(self._words)
+                self._vocab[word] = token_id
+                self._words.append(word)
+            return token_id
+
+    def __call__(self, text, add_special_tokens=True, truncation=False, max_length=None, **kwargs):
+        ids = [self._id(w) for w in text.split()]
+        if truncation and max_length:
+            ids = ids[:max_length - (2 if add_special_tokens else 0)]
+        if add_special_tokens:
+            ids = self.build_inputs_with_special_tokens(ids)
+        return {"input_ids": ids}
+
+    def num_special_tokens_to_add(self, pair=False):
+        return 2
+
+    def build_inputs_with_special_tokens(self, ids):
+        return [BOS] + list(ids) + [EOS]
+
+    def convert_ids_to_tokens(self, token_id):
+        return self._words[token_id]
+
+    def decode(self, ids, skip_special_tokens=False):
+        special = set(self.all_special_ids) if skip_special_tokens else set()
+        return " ".join(self._words[i] for i in ids if i not in special)
+
+    def pad(self, encoded, return_tensors=None):
+        rows = encoded["input_ids"]
+        width = max(len(r) for r in rows)
+        return _Batch(
+            input_ids=_Ids(list(r) + [PAD] * (width - len(r)) for r in rows),
+            attention_mask=_Ids([1] * len(r) + [0] * (width - len(r)) for r in rows),
+        )
+
+class StubModel:
+    device = "cpu"
+
+    def __init__(self, seconds_per_token=0.0):
+        self.seconds_per_token = seconds_per_token
+
+    def generate(self, input_ids, attention_mask=None, max_length=60, min_length=0, num_beams=1, **kwargs):
+        max_new = kwargs.get("max_new_tokens") or max_length
+        outputs = []
+        for row in input_ids:
+            content = [t for t in row if t not in (BOS, PAD, EOS)]
+            outputs.append([EOS, BOS] + content[:max(1, max_new - 2)] + [EOS])
+        if self.seconds_per_token:
+            time.sleep(self.seconds_per_token * num_beams * sum(len(o) for o in outputs))
+        return _Ids(outputs)
+
+class StubSummarizer:
+    """Callable like a transformers summarization pipeline."""
+
+    def __init__(self, seconds_per_token=0.0):
+        self.tokenizer = StubTokenizer()
+        self.model = StubModel(seconds_per_token)
+
+    def __call__(self, texts, max_length=60, min_length=0, do_sample=False, num_beams=1, **kwargs):
+        single = isinstance(texts, str)
+        if single:
+            texts = [texts]
+        batch = self.tokenizer.pad({"input_ids": [self.tokenizer(t)["input_ids"] for t in texts]})
+        generated = self.model.generate(**batch, max_length=max_length, num_beams=num_beams)
+        results = [{"summary_text": self.tokenizer.decode(ids, skip_special_tokens=True)} for ids in generated]
+        return results
+
+class ReadyLoader:
+    """Stands in for SummarizerLoader when the summarizer is already built."""
+
+    def __init__(self, summarizer, tokenizer):
+        self._result = (summarizer, tokenizer)
+
+    def ready(self):
+        return True
+
+    def get(self):
+        return self._result
@@ -10,6 +10,52 @@ MAX_ARTICLE_AGE_DAYS = 7  # Maximum age of articles (in days) to fetch from RSS
 NEWSLETTER_HEADLINE = "Your Newsletter Headline Here"  # Headline for the top of the exported markdown file
 APPEND_DATE_TO_HEADLINE = True  # If True, append the date after the newsletter headline in the markdown export
 
+EXPORT_FORMATS = ["markdown"]  # Any of "markdown", "html" and "json" (JSON Feed); all are written for each issue
 INCLUDE_DISCLAIMER = False  # If True, include disclaimer at the bottom of the markdown export
 DISCLAIMER_TEXT = "Notes for readers. I mention that the summaries are GenAI created"  # The disclaimer text to include
+HUGGINGFACE_MODEL = "facebook/bart-large-cnn"  # Model for summarization
 NUM_BEAMS = 3  # Number of beams for beam search in summarization (higher = more accurate, slower)
+SUMMARY_BATCH_SIZE = 4  # Number of articles summarized per model call (tune per host; larger uses more memory)
+FETCH_WORKERS = 8  # Number of article downloads to run in parallel
+FETCH_PER_HOST_LIMIT = 2  # Maximum concurrent downloads from a single host
+FETCH_TIMEOUT = 10  # Per-request timeout in seconds
+FETCH_TOTAL_BUDGET = 120  # Total seconds allowed for the download stage; unfinished downloads are skipped
+FETCH_RETRIES = 2  # Retries after a timeout, connection error or 429/5xx response, with jittered exponential backoff
+FETCH_BACKOFF_BASE = 0.5  # Seconds; the backoff before retry n is random between 0 and FETCH_BACKOFF_BASE * 2**n
+FETCH_MIN_TIMEOUT = 3  # Lower bound for the adaptive per-host timeout (4x the host's average response time, up to FETCH_TIMEOUT)
+HOST_FAILURE_THRESHOLD = 3  # Distinct pages failing in a row (after retries; a 429/5xx counts half) before a host is skipped
+HOST_COOLDOWN_SECONDS = 6 * 3600  # How long a failing host is skipped before a single probe request is tried again
+SUMMARY_CACHE_MAX_BYTES = 50 * 1024 * 1024  # Size cap for the summary cache in the database; oldest entries are evicted first
+PAGE_CACHE_OFFLINE = False  # If True, replay articles from the page cache without any network requests
+INFERENCE_BACKEND = "torch"  # "torch", "torch-int8" (dynamic int8 quantization, CPU) or "onnx" (ONNX Runtime, CPU; needs optimum[onnxruntime])
+ONNX_MODEL_DIR = "onnx-model"  # Where the exported ONNX model is stored and reused
+SUMMARY_MODE = "abstractive"  # "abstractive" (the model) or "extractive" (fast sentence selection, no generation)
+SUMMARY_TIME_BUDGET_SECONDS = None  # If set, a run deadline: beams and summary lengths are lowered to fit it, and articles that still don't fit are summarized extractively
+EXTRACTIVE_METHOD = "textrank"  # Sentence scoring for extractive summaries: "textrank" or "tfidf"
+EXTRACTIVE_PRECOMPRESS = True  # If True, articles too long for the model are reduced to their key sentences instead of truncated
+LONG_ARTICLE_MODE = False  # If True, summarize articles longer than the model input in sentence-aligned chunks instead of truncating
+LONG_ARTICLE_BUDGET_SECONDS = 30  # Per-article latency budget that bounds how many chunks a long article is split into
+FEED_WORKERS = 8  # Number of RSS feeds fetched in parallel
+FEED_ONLY_NEW_ENTRIES = True  # If True, only entries added since the last run are read from a feed (plus earlier entries not yet processed)
+NEAR_DUPLICATE_ACTION = "skip"  # Near-duplicate (syndicated) articles: "skip", "reuse" the original's summary, or "off"
+NEAR_DUPLICATE_THRESHOLD = 0.8  # Estimated text similarity (0-1) above which two articles count as duplicates
+STORE_BODY = False  # If True, store each article's full text in the database so `newsletter search` also matches body text
+DOMAIN_NAME_TTL_DAYS = 30  # How long a site's publication name (og:site_name / twitter:site) is reused before it is looked up again
+METRICS_PATH = None  # If set (e.g. "metrics.jsonl"), write per-stage timings and counters for each run to this file
+SUMMARY_WORKERS = 0  # If > 0, summarize on this many processes, each with its own copy of the model (CPU hosts with many cores)
+SUMMARY_THREADS_PER_WORKER = None  # Torch threads per worker process; None splits the available cores evenly
+DAEMON_HOST = "127.0.0.1"  # Address of the resident newsletter daemon (newsletter-daemon)
+DAEMON_PORT = 8765  # Port of the resident newsletter daemon
+SPECULATIVE_TOP_N = 0  # While the picker is open, download and summarize this many top candidates in the background (0 = off)
+SPECULATIVE_CACHE_SIZE = 50  # Most speculative summaries kept in memory; the oldest are dropped first
+SPECULATIVE_PREVIEW = True  # Show speculative summaries in the picker as they become ready
+SELECTION_MODE = "gui"  # "gui" for the Tk picker, "auto" to select articles with the rules below (also: --headless)
+AUTO_SELECT_COUNT = 10  # Number of articles auto-selected per run
+AUTO_SELECT_MAX_CANDIDATES = None  # Candidates fetched for auto-selection; None ranks every new feed entry
+AUTO_SELECT_DOMAIN_ALLOW = []  # If non-empty, only these domains (and their subdomains) are eligible
+AUTO_SELECT_DOMAIN_DENY = []  # Domains (and their subdomains) that are never selected
+AUTO_SELECT_KEYWORDS = {}  # Title keyword weights, matched as whole words, e.g. {"climate": 2.0, "celebrity": -3.0}
+AUTO_SELECT_RECENCY_HALF_LIFE_DAYS = 2.0  # Recency bonus halves every N days
+AUTO_SELECT_RECENCY_WEIGHT = 1.0  # Recency bonus for an article published today
+AUTO_SELECT_MAX_PER_SOURCE = 2  # At most this many articles per domain
+AUTO_SELECT_MIN_SCORE = None  # If set, skip articles scoring below this
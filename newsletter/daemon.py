@@ -0,0 +1,183 @@
+import argparse
+import datetime
+import json
+import os
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import config
+from config import RSS_URL, DB_PATH, EXPORT_PATH, SUMMARY_MAX_WORDS
+from newsletter.db import get_storage, save_issue_headline
+from newsletter.export import export_issue, EXPORT_FORMATS
+from newsletter.pipeline import run_pipeline
+from newsletter.rss import fetch_instapaper_articles
+from newsletter.selection import RuleSelector
+from newsletter.summarize import (
+    SummarizerLoader,
+    SUMMARY_BATCH_SIZE,
+    resolve_device,
+    generate_summary_headline,
+)
+
+DAEMON_HOST = getattr(config, "DAEMON_HOST", "127.0.0.1")
+DAEMON_PORT = getattr(config, "DAEMON_PORT", 8765)
+
+def _daemon_url(path, host=None, port=None):
+    return f"http://{host or DAEMON_HOST}:{port or DAEMON_PORT}{path}"
+
+def _normalize_urls(urls):
+    selected = []
+    for item in urls:
+        if isinstance(item, str):
+            item = {"url": item}
+        selected.append({
+            "url": item["url"],
+            "title": item.get("title") or item["url"],
+            "published": item.get("published", ""),
+        })
+    return selected
+
+def _export_dir(requested):
+    """Resolve a job's export_path, which must be EXPORT_PATH or a directory inside it."""
+    if not requested:
+        return EXPORT_PATH
+    base = os.path.realpath(EXPORT_PATH)
+    # The daemon has no auth, so a client must not be able to write anywhere else
+    path = os.path.realpath(os.path.join(base, requested))
+    if os.path.commonpath([base, path]) != base:
+        raise ValueError(f"export_path must be inside {EXPORT_PATH}: {requested}")
+    return path
+
+def run_job(job, loader, emit):
+    """Run one newsletter job with the warm model, reporting progress through emit(event)."""
+    started = time.perf_counter()
+    export_path = _export_dir(job.get("export_path"))
+    if job.get("urls"):
+        selected = _normalize_urls(job["urls"])
+    else:
+        # No one is at the daemon's screen, so feed jobs always use the rule-based selector
+        selector = RuleSelector(count=job.get("max_articles"))
+        feeds = job.get("feeds") or RSS_URL
+        selected = selector.select(fetch_instapaper_articles(feeds, DB_PATH, selector.max_candidates))
+    emit({"event": "selected", "count": len(selected)})
+    if not selected:
+        emit({"event": "done", "processed": 0, "seconds": time.perf_counter() - started})
+        return
+    records = run_pipeline(
+        selected, loader, DB_PATH, SUMMARY_MAX_WORDS, batch_size=SUMMARY_BATCH_SIZE,
+        on_record=lambda rec: emit({"event": "summarized", "url": rec["url"], "headline": rec["headline"]}),
+    )
+    if records:
+        summarizer, _ = loader.get()
+        summary_headline = generate_summary_headline(summarizer, records)
+        save_issue_headline(DB_PATH, datetime.date.today().isoformat(), summary_headline)
+        filenames = export_issue(records, export_path, job.get("formats") or EXPORT_FORMATS, summary_headline=summary_headline)
+        emit({"event": "exported", "path": filenames[0], "paths": filenames, "headline": summary_headline})
+    emit({"event": "done", "processed": len(records), "seconds": time.perf_counter() - started})
+
+class NewsletterDaemon:
+    """Keeps the summarizer, tokenizer and database connection warm between jobs.
+
+    Jobs arrive as JSON on POST /jobs and run one at a time; progress is
+    streamed back as one JSON object per line.  GET /health reports whether
+    the model has finished loading.
+    """
+
+    def __init__(self, host=None, port=None):
+        self.host = host or DAEMON_HOST
+        self.port = port or DAEMON_PORT
+        get_storage(DB_PATH)
+        self.loader = SummarizerLoader(lambda: resolve_device(DB_PATH))
+        self.job_lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((self.host, self.port), self._handler())
+        self.httpd.daemon_threads = True
+
+    def serve_forever(self):
+        print(f"Newsletter daemon listening on http://{self.host}:{self.port}")
+        try:
+            self.httpd.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.httpd.server_close()
+
+    def _handler(self):
+        daemon = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _json(self, status, payload):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                if self.path == "/health":
+                    return self._json(200, {"status": "ok", "model_ready": daemon.loader.ready(), "busy": daemon.job_lock.locked()})
+                self._json(404, {"error": "not found"})
+
+            def do_POST(self):
+                if self.path != "/jobs":
+                    return self._json(404, {"error": "not found"})
+                try:
+                    length = int(self.headers.get("Content-Length", 0))
+                    job = json.loads(self.rfile.read(length) or b"{}")
+                except ValueError as e:
+                    return self._json(400, {"error": f"invalid job: {e}"})
+                # Stream newline-delimited JSON events; the connection closes when the job ends
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.end_headers()
+
+                def emit(event):
+                    try:
+                        self.wfile.write((json.dumps(event) + "\n").encode("utf-8"))
+                        self.wfile.flush()
+                    except OSError:
+                        # The client went away; finish the job anyway so the work is kept
+                        pass
+
+                if daemon.job_lock.locked():
+                    emit({"event": "queued"})
+                with daemon.job_lock:
+                    try:
+                        run_job(job, daemon.loader, emit)
+                    except Exception as e:
+                        print(f"Job failed: {e}")
+                        emit({"event": "error", "error": f"{type(e).__name__}: {e}"})
+
+        return Handler
+
+def daemon_available(host=None, port=None, timeout=0.5):
+    """Return True if a daemon answers on the configured address."""
+    try:
+        with urllib.request.urlopen(_daemon_url("/health", host, port), timeout=timeout) as resp:
+            return resp.status == 200
+    except OSError:
+        return False
+
+def submit_job(job, host=None, port=None):
+    """Send a job to the daemon and yield its progress events as they arrive."""
+    req = urllib.request.Request(
+        _daemon_url("/jobs", host, port),
+        data=json.dumps(job).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+        method="POST",
+    )
+    with urllib.request.urlopen(req) as resp:
+        for line in resp:
+            if line.strip():
+                yield json.loads(line)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="newsletter-daemon", description="Run the newsletter summarizer as a resident service.")
+    parser.add_argument("--host", default=DAEMON_HOST)
+    parser.add_argument("--port", type=int, default=DAEMON_PORT)
+    args = parser.parse_args(argv)
+    NewsletterDaemon(args.host, args.port).serve_forever()
+
+if __name__ == "__main__":
+    main()
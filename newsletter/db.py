@@ -1,81 +1,29 @@
 import sqlite3
+import json
+import zlib
+import time
+import datetime
+import threading
+import config
+from newsletter import metrics
 
-def ensure_model_table_and_get_device(db_path):
-    conn = sqlite3.connect(db_path)
-    c = conn.cursor()
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS Model (
-            key TEXT PRIMARY KEY,
-            value TEXT
-        )
-    ''')
-    c.execute("SELECT value FROM Model WHERE key = 'cpu_model'")
-    row = c.fetchone()
-    device = None
-    if row:
-        try:
-            device = int(row[0])
-            print(f"Loaded device from Model table: {device}")
-        except Exception:
-            device = row[0]
-            print(f"Loaded device from Model table: {device}")
-    conn.close()
-    return device
+STORE_BODY = getattr(config, "STORE_BODY", False)
 
-def ensure_models_table_and_get_device(db_path):
-    conn = sqlite3.connect(db_path)
-    c = conn.cursor()
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS Models (
-            key TEXT PRIMARY KEY,
-            value TEXT
-        )
-    ''')
-    c.execute("SELECT value FROM Models WHERE key = 'cpu_model'")
-    row = c.fetchone()
-    device = None
-    if row:
-        try:
-            device = int(row[0])
-            print(f"Loaded device from Models table: {device}")
-        except Exception:
-            device = row[0]
-            print(f"Loaded device from Models table: {device}")
-    conn.close()
-    return device
+# SQLite caps the number of bound parameters per statement; stay well below it
+_IN_CHUNK = 500
 
-def save_device_to_model_table(db_path, device):
-    conn = sqlite3.connect(db_path)
+def _migrate_v1(conn):
+    """Initial schema: merge Model into Models, unique story URLs, cache tables."""
     c = conn.cursor()
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS Model (
-            key TEXT PRIMARY KEY,
-            value TEXT
-        )
-    ''')
-    c.execute("INSERT OR REPLACE INTO Model (key, value) VALUES (?, ?)", ('cpu_model', str(device)))
-    conn.commit()
-    conn.close()
-    print(f"Saved device to Model table: {device}")
-
-def save_device_to_models_table(db_path, device):
-    conn = sqlite3.connect(db_path)
-    c = conn.cursor()
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS Models (
-            key TEXT PRIMARY KEY,
-            value TEXT
-        )
-    ''')
-    c.execute("INSERT OR REPLACE INTO Models (key, value) VALUES (?, ?)", ('cpu_model', str(device)))
-    conn.commit()
-    conn.close()
-    print(f"Saved device to Models table: {device}")
-
-def get_existing_urls(db_path):
-    conn = sqlite3.connect(db_path)
-    c = conn.cursor()
-    # Ensure stories table exists with all columns
+    c.execute('''CREATE TABLE IF NOT EXISTS Models (
+        key TEXT PRIMARY KEY,
+        value TEXT
+    )''')
+    c.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'Model'")
+    if c.fetchone():
+        # Older versions wrote the device to both tables; Models wins on conflict
+        c.execute("INSERT OR IGNORE INTO Models (key, value) SELECT key, value FROM Model")
+        c.execute("DROP TABLE Model")
     c.execute('''CREATE TABLE IF NOT EXISTS stories (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         publication_name TEXT,
@@ -86,56 +34,628 @@ def get_existing_urls(db_path):
         summary TEXT,
         source TEXT
     )''')
-    conn.commit()
-    conn.close()
-    conn = sqlite3.connect(db_path)
+    c.execute("PRAGMA table_info(stories)")
+    columns = [row[1] for row in c.fetchall()]
+    if "source" not in columns:
+        c.execute("ALTER TABLE stories ADD COLUMN source TEXT")
+    # Keep the first copy of any URL stored more than once before adding the unique index
+    c.execute("DELETE FROM stories WHERE id NOT IN (SELECT MIN(id) FROM stories GROUP BY url)")
+    c.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_stories_url ON stories (url)")
+    c.execute('''CREATE TABLE IF NOT EXISTS summary_cache (
+        key TEXT PRIMARY KEY,
+        summary TEXT,
+        size INTEGER,
+        last_used REAL
+    )''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_summary_cache_last_used ON summary_cache (last_used)")
+    c.execute('''CREATE TABLE IF NOT EXISTS pages (
+        url TEXT PRIMARY KEY,
+        html BLOB,
+        text TEXT,
+        authors TEXT,
+        etag TEXT,
+        last_modified TEXT,
+        fetched_at REAL
+    )''')
+    c.execute('''CREATE TABLE IF NOT EXISTS feeds (
+        url TEXT PRIMARY KEY,
+        etag TEXT,
+        modified TEXT,
+        last_entry_id TEXT,
+        fetched_at REAL
+    )''')
+
+def _migrate_v2(conn):
+    """Near-duplicate detection: canonical story URLs and MinHash fingerprints."""
+    from newsletter.dedupe import canonicalize_url
     c = conn.cursor()
-    c.execute("SELECT url FROM stories")
-    existing_urls = set(row[0] for row in c.fetchall())
-    conn.close()
-    return existing_urls
+    c.execute("PRAGMA table_info(stories)")
+    columns = [row[1] for row in c.fetchall()]
+    if "canonical_url" not in columns:
+        c.execute("ALTER TABLE stories ADD COLUMN canonical_url TEXT")
+    rows = c.execute("SELECT id, url FROM stories WHERE url IS NOT NULL").fetchall()
+    c.executemany("UPDATE stories SET canonical_url = ? WHERE id = ?",
+                  [(canonicalize_url(url), story_id) for story_id, url in rows])
+    c.execute("CREATE INDEX IF NOT EXISTS idx_stories_canonical_url ON stories (canonical_url)")
+    c.execute('''CREATE TABLE IF NOT EXISTS signatures (
+        url TEXT PRIMARY KEY,
+        signature BLOB
+    )''')
+    # One row per LSH band; articles sharing any (band, bucket) are candidate duplicates
+    c.execute('''CREATE TABLE IF NOT EXISTS fingerprints (
+        url TEXT,
+        band INTEGER,
+        bucket TEXT
+    )''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_fingerprints_band_bucket ON fingerprints (band, bucket)")
 
-def ensure_stories_table_has_source_column(conn):
+def _migrate_v3(conn):
+    """Full-text search: optional article body and an FTS5 index kept in sync by triggers."""
     c = conn.cursor()
     c.execute("PRAGMA table_info(stories)")
     columns = [row[1] for row in c.fetchall()]
-    if "source" not in columns:
-        c.execute("ALTER TABLE stories ADD COLUMN source TEXT")
-        conn.commit()
+    if "body" not in columns:
+        c.execute("ALTER TABLE stories ADD COLUMN body TEXT")
+    try:
+        # External-content table: the text lives in stories, the index only stores postings
+        c.execute('''CREATE VIRTUAL TABLE IF NOT EXISTS stories_fts USING fts5 (
+            headline, summary, source, body,
+            content='stories', content_rowid='id', tokenize='porter unicode61'
+        )''')
+    except sqlite3.OperationalError as e:
+        print(f"SQLite FTS5 is not available ({e}); full-text search is disabled.")
+        return
+    c.execute('''CREATE TRIGGER IF NOT EXISTS stories_fts_insert AFTER INSERT ON stories BEGIN
+        INSERT INTO stories_fts (rowid, headline, summary, source, body)
+        VALUES (new.id, new.headline, new.summary, new.source, new.body);
+    END''')
+    c.execute('''CREATE TRIGGER IF NOT EXISTS stories_fts_delete AFTER DELETE ON stories BEGIN
+        INSERT INTO stories_fts (stories_fts, rowid, headline, summary, source, body)
+        VALUES ('delete', old.id, old.headline, old.summary, old.source, old.body);
+    END''')
+    c.execute('''CREATE TRIGGER IF NOT EXISTS stories_fts_update AFTER UPDATE ON stories BEGIN
+        INSERT INTO stories_fts (stories_fts, rowid, headline, summary, source, body)
+        VALUES ('delete', old.id, old.headline, old.summary, old.source, old.body);
+        INSERT INTO stories_fts (rowid, headline, summary, source, body)
+        VALUES (new.id, new.headline, new.summary, new.source, new.body);
+    END''')
+    # One-time backfill of stories stored before the index existed
+    c.execute("INSERT INTO stories_fts (stories_fts) VALUES ('rebuild')")
 
-def save_to_db(db_path, records):
-    print(f"Saving {len(records)} records to the database...")  # Debug print
-    conn = sqlite3.connect(db_path)
+def _migrate_v4(conn):
+    """Back issues: the date each story went out, and each issue's generated headline."""
     c = conn.cursor()
-    # Ensure stories table exists with all columns
-    c.execute('''CREATE TABLE IF NOT EXISTS stories (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        publication_name TEXT,
+    c.execute("PRAGMA table_info(stories)")
+    columns = [row[1] for row in c.fetchall()]
+    if "issue_date" not in columns:
+        c.execute("ALTER TABLE stories ADD COLUMN issue_date TEXT")
+    # Older stories have no record of their issue; the publication date is the closest guess
+    c.execute('''UPDATE stories SET issue_date = substr(publication_date, 1, 10)
+                 WHERE issue_date IS NULL
+                   AND publication_date GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]*' ''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_stories_issue_date ON stories (issue_date, id)")
+    c.execute('''CREATE TABLE IF NOT EXISTS issues (
+        issue_date TEXT PRIMARY KEY,
         headline TEXT,
-        url TEXT,
-        author TEXT,
-        publication_date TEXT,
-        summary TEXT,
-        source TEXT
+        created_at REAL
+    )''')
+
+def _migrate_v5(conn):
+    """Publication names resolved per host, so known domains need no page parsing."""
+    conn.execute('''CREATE TABLE IF NOT EXISTS domains (
+        host TEXT PRIMARY KEY,
+        publication_name TEXT,
+        resolved_at REAL
+    )''')
+
+def _migrate_v6(conn):
+    """Per-host fetch health: latency average, failure streak and circuit state."""
+    conn.execute('''CREATE TABLE IF NOT EXISTS hosts (
+        host TEXT PRIMARY KEY,
+        latency REAL,
+        failures INTEGER NOT NULL DEFAULT 0,
+        total_requests INTEGER NOT NULL DEFAULT 0,
+        total_failures INTEGER NOT NULL DEFAULT 0,
+        state TEXT NOT NULL DEFAULT 'closed',
+        opened_at REAL,
+        updated_at REAL
     )''')
-    ensure_stories_table_has_source_column(conn)
-    c.execute("SELECT url FROM stories")
-    existing_urls = set(row[0] for row in c.fetchall())
-    for rec in records:
-        db_headline = rec["headline"].replace('\n', ' ').replace('\r', ' ')
-        if rec["url"] in existing_urls:
-            continue
-        c.execute('''INSERT INTO stories (publication_name, headline, url, author, publication_date, summary, source)
-                     VALUES (?, ?, ?, ?, ?, ?, ?)''',
-                  (
-                      rec.get("publication_name", ""),
-                      db_headline,
-                      rec["url"],
-                      rec["author"],
-                      rec["publication_date"],
-                      rec["summary"],
-                      rec.get("source", rec.get("publication_name", "")),
-                  ))
-    conn.commit()
-    conn.close()
-    print("Records saved to database.")  # Debug print
+
+def _migrate_v7(conn):
+    """Feed entries offered but not yet stored, so they are offered again after a 304."""
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(feeds)")}
+    if "pending_entries" not in columns:
+        conn.execute("ALTER TABLE feeds ADD COLUMN pending_entries TEXT")
+
+def _migrate_v8(conn):
+    """URLs dropped as near-duplicates, so later runs skip them without downloading."""
+    conn.execute('''CREATE TABLE IF NOT EXISTS duplicates (
+        url TEXT PRIMARY KEY,
+        canonical_url TEXT,
+        duplicate_of TEXT,
+        similarity REAL,
+        seen_at REAL
+    )''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_duplicates_canonical_url ON duplicates (canonical_url)")
+
+# Schema migrations, applied in order; PRAGMA user_version records how many have run
+MIGRATIONS = [
+    _migrate_v1,
+    _migrate_v2,
+    _migrate_v3,
+    _migrate_v4,
+    _migrate_v5,
+    _migrate_v6,
+    _migrate_v7,
+    _migrate_v8,
+]
+
+def _chunks(items, size=_IN_CHUNK):
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+def _parse_device(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return value
+
+class Storage:
+    """A single long-lived SQLite connection for one database file.
+
+    The connection runs in WAL mode and is shared between threads, so every
+    method takes the instance lock.  The schema is migrated once when the
+    storage is opened.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.migrate()
+
+    def migrate(self):
+        with self.lock:
+            version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+            for target, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+                print(f"Migrating database schema to version {target}...")  # Debug print
+                with self.conn:
+                    migration(self.conn)
+                    self.conn.execute(f"PRAGMA user_version = {target}")
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    # Models (key/value settings such as the device)
+
+    def get_setting(self, key):
+        with self.lock:
+            row = self.conn.execute("SELECT value FROM Models WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_setting(self, key, value):
+        with self.lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO Models (key, value) VALUES (?, ?)", (key, str(value)))
+
+    # Stories
+
+    def existing_urls(self, candidates):
+        """Return the subset of candidate URLs already stored or skipped as near-duplicates, via the url indexes."""
+        found = set()
+        with self.lock:
+            for chunk in _chunks(set(candidates), _IN_CHUNK // 2):
+                placeholders = ",".join("?" * len(chunk))
+                rows = self.conn.execute(
+                    f"SELECT url FROM stories WHERE url IN ({placeholders}) "
+                    f"UNION SELECT url FROM duplicates WHERE url IN ({placeholders})", chunk + chunk
+                )
+                found.update(row[0] for row in rows)
+        return found
+
+    def existing_canonical_urls(self, candidates):
+        """Return the subset of canonical URLs already stored or skipped as near-duplicates, via the canonical_url indexes."""
+        found = set()
+        with self.lock:
+            for chunk in _chunks(set(candidates), _IN_CHUNK // 2):
+                placeholders = ",".join("?" * len(chunk))
+                rows = self.conn.execute(
+                    f"SELECT canonical_url FROM stories WHERE canonical_url IN ({placeholders}) "
+                    f"UNION SELECT canonical_url FROM duplicates WHERE canonical_url IN ({placeholders})", chunk + chunk
+                )
+                found.update(row[0] for row in rows)
+        return found
+
+    def known_duplicates(self, candidates):
+        """Return the candidate URLs recorded as near-duplicates, matched by URL or canonical URL."""
+        from newsletter.dedupe import canonicalize_url
+        canonical = {url: canonicalize_url(url) for url in set(candidates)}
+        found = set()
+        with self.lock:
+            for chunk in _chunks(canonical.items(), _IN_CHUNK // 2):
+                urls = [url for url, _ in chunk]
+                canons = [canon for _, canon in chunk]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self.conn.execute(
+                    f"SELECT url, canonical_url FROM duplicates WHERE url IN ({placeholders}) OR canonical_url IN ({placeholders})",
+                    urls + canons,
+                )
+                for url, canon in rows:
+                    found.add(url)
+                    found.update(u for u, c in chunk if c == canon)
+        return found & set(canonical)
+
+    def save_duplicate(self, url, duplicate_of, similarity=None):
+        from newsletter.dedupe import canonicalize_url
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO duplicates (url, canonical_url, duplicate_of, similarity, seen_at) VALUES (?, ?, ?, ?, ?)",
+                (url, canonicalize_url(url), duplicate_of, similarity, time.time()),
+            )
+
+    def get_story_summary(self, url):
+        with self.lock:
+            row = self.conn.execute("SELECT summary FROM stories WHERE url = ?", (url,)).fetchone()
+        return row[0] if row else None
+
+    def save_stories(self, records, store_body=False):
+        """Bulk insert records; URLs already stored are left untouched. Returns rows inserted.
+
+        The article body is only kept (and indexed for search) with
+        ``store_body``.  Stories are filed under today's issue unless the
+        record has an ``issue_date``.  Records carrying a MinHash signature ("minhash")
+        also get their LSH fingerprints stored, in the same transaction.
+        """
+        from newsletter.dedupe import canonicalize_url, lsh_buckets
+        today = datetime.date.today().isoformat()
+        rows = [
+            (
+                rec.get("publication_name", ""),
+                rec["headline"].replace('\n', ' ').replace('\r', ' '),
+                rec["url"],
+                rec["author"],
+                rec["publication_date"],
+                rec["summary"],
+                rec.get("source", rec.get("publication_name", "")),
+                canonicalize_url(rec["url"]),
+                rec.get("body") if store_body else None,
+                rec.get("issue_date") or today,
+            )
+            for rec in records
+        ]
+        signed = [rec for rec in records if rec.get("minhash") is not None]
+        with self.lock, self.conn:
+            # rowcount, unlike total_changes, leaves out the rows the FTS triggers write
+            inserted = self.conn.executemany('''INSERT INTO stories (publication_name, headline, url, author, publication_date, summary, source, canonical_url, body, issue_date)
+                                     VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                                     ON CONFLICT (url) DO NOTHING''', rows).rowcount
+            if signed:
+                self.conn.executemany("INSERT OR IGNORE INTO signatures (url, signature) VALUES (?, ?)",
+                                      [(rec["url"], rec["minhash"].tobytes()) for rec in signed])
+                self.conn.executemany("DELETE FROM fingerprints WHERE url = ?", [(rec["url"],) for rec in signed])
+                self.conn.executemany(
+                    "INSERT INTO fingerprints (url, band, bucket) VALUES (?, ?, ?)",
+                    [(rec["url"], band, bucket) for rec in signed for band, bucket in lsh_buckets(rec["minhash"])],
+                )
+            return inserted
+
+    def similar_signatures(self, buckets):
+        """Return {url: signature bytes} for stored stories sharing any of the (band, bucket) keys."""
+        found = {}
+        with self.lock:
+            urls = set()
+            for band, bucket in buckets:
+                rows = self.conn.execute("SELECT url FROM fingerprints WHERE band = ? AND bucket = ?", (band, bucket))
+                urls.update(row[0] for row in rows)
+            for chunk in _chunks(urls):
+                placeholders = ",".join("?" * len(chunk))
+                rows = self.conn.execute(f"SELECT url, signature FROM signatures WHERE url IN ({placeholders})", chunk)
+                found.update((row[0], row[1]) for row in rows)
+        return found
+
+    def iter_stories(self, start_date, end_date, batch_size=256):
+        """Yield stories filed under issues from start_date to end_date (ISO dates, inclusive), oldest first.
+
+        Rows are streamed from a cursor on a separate read connection, so
+        the shared connection stays free and memory use is bounded by
+        ``batch_size`` whatever the size of the range.
+        """
+        conn = sqlite3.connect(self.db_path)
+        try:
+            cursor = conn.execute('''SELECT headline, url, author, publication_date, summary, source, publication_name, issue_date
+                                     FROM stories WHERE issue_date BETWEEN ? AND ?
+                                     ORDER BY issue_date, id''', (start_date, end_date))
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for r in rows:
+                    yield {
+                        "headline": r[0] or "",
+                        "url": r[1],
+                        "author": r[2],
+                        "publication_date": r[3],
+                        "summary": r[4],
+                        "source": r[5] or r[6],
+                        "issue_date": r[7],
+                    }
+        finally:
+            conn.close()
+
+    def save_issue(self, issue_date, headline):
+        with self.lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO issues (issue_date, headline, created_at) VALUES (?, ?, ?)",
+                              (issue_date, headline, time.time()))
+
+    def get_issue_headline(self, issue_date):
+        with self.lock:
+            row = self.conn.execute("SELECT headline FROM issues WHERE issue_date = ?", (issue_date,)).fetchone()
+        return row[0] if row else None
+
+    def search(self, query, limit=20):
+        """Rank stories matching an FTS5 query; headline hits weigh most, body hits least.
+
+        Returns dicts with headline, url, source, publication_date, snippet
+        and rank (lower is better).  A query that is not valid FTS5 syntax
+        is retried with every word quoted as a plain term.
+        """
+        # Stories saved before the source column existed only have publication_name
+        sql = '''SELECT s.headline, s.url, COALESCE(NULLIF(s.source, ''), s.publication_name), s.publication_date,
+                        snippet(stories_fts, -1, '[', ']', '...', 16),
+                        bm25(stories_fts, 10.0, 4.0, 2.0, 1.0) AS rank
+                 FROM stories_fts JOIN stories s ON s.id = stories_fts.rowid
+                 WHERE stories_fts MATCH ?
+                 ORDER BY rank LIMIT ?'''
+        with self.lock:
+            try:
+                rows = self.conn.execute(sql, (query, limit)).fetchall()
+            except sqlite3.OperationalError as e:
+                if "no such table" in str(e):
+                    raise RuntimeError("Full-text search is not available: SQLite was built without FTS5") from e
+                quoted = " ".join('"{}"'.format(term.replace('"', '""')) for term in query.split())
+                rows = self.conn.execute(sql, (quoted, limit)).fetchall()
+        return [
+            {"headline": r[0], "url": r[1], "source": r[2], "publication_date": r[3], "snippet": r[4], "rank": r[5]}
+            for r in rows
+        ]
+
+    # Summary cache
+
+    def get_cached_summary(self, key):
+        with self.lock, self.conn:
+            row = self.conn.execute("SELECT summary FROM summary_cache WHERE key = ?", (key,)).fetchone()
+            if row:
+                self.conn.execute("UPDATE summary_cache SET last_used = ? WHERE key = ?", (time.time(), key))
+        return row[0] if row else None
+
+    def save_cached_summary(self, key, summary, max_bytes=None):
+        size = len(key) + len(summary.encode("utf-8"))
+        with self.lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO summary_cache (key, summary, size, last_used) VALUES (?, ?, ?, ?)",
+                              (key, summary, size, time.time()))
+        if max_bytes is not None:
+            self.evict_summary_cache(max_bytes)
+
+    def evict_summary_cache(self, max_bytes):
+        """Drop least recently used cache entries until the cache fits in max_bytes."""
+        with self.lock, self.conn:
+            total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM summary_cache").fetchone()[0]
+            if total <= max_bytes:
+                return 0
+            evicted = []
+            for key, size in self.conn.execute("SELECT key, size FROM summary_cache ORDER BY last_used ASC").fetchall():
+                if total <= max_bytes:
+                    break
+                evicted.append((key,))
+                total -= size
+            self.conn.executemany("DELETE FROM summary_cache WHERE key = ?", evicted)
+        print(f"Evicted {len(evicted)} entries from summary cache.")  # Debug print
+        return len(evicted)
+
+    # Page cache
+
+    def get_cached_pages(self, urls):
+        """Return {url: page} for the given urls that are in the page cache."""
+        pages = {}
+        with self.lock:
+            for chunk in _chunks(set(urls)):
+                placeholders = ",".join("?" * len(chunk))
+                rows = self.conn.execute(
+                    f"SELECT url, html, text, authors, etag, last_modified, fetched_at FROM pages WHERE url IN ({placeholders})",
+                    chunk,
+                ).fetchall()
+                for row in rows:
+                    pages[row[0]] = {
+                        "url": row[0],
+                        "html": zlib.decompress(row[1]).decode("utf-8") if row[1] is not None else None,
+                        "text": row[2],
+                        "authors": json.loads(row[3]) if row[3] else [],
+                        "etag": row[4],
+                        "last_modified": row[5],
+                        "fetched_at": row[6],
+                    }
+        return pages
+
+    def save_cached_page(self, page):
+        """Store freshly downloaded HTML; any previous extraction is discarded."""
+        with self.lock, self.conn:
+            self.conn.execute('''INSERT OR REPLACE INTO pages (url, html, text, authors, etag, last_modified, fetched_at)
+                                 VALUES (?, ?, NULL, NULL, ?, ?, ?)''',
+                              (
+                                  page["url"],
+                                  zlib.compress(page["html"].encode("utf-8")),
+                                  page.get("etag"),
+                                  page.get("last_modified"),
+                                  time.time(),
+                              ))
+
+    def save_page_extraction(self, url, text, authors):
+        with self.lock, self.conn:
+            self.conn.execute("UPDATE pages SET text = ?, authors = ? WHERE url = ?",
+                              (text, json.dumps(list(authors)), url))
+
+    # Domains
+
+    def get_domain_name(self, host, max_age=None):
+        """Return the cached publication name for host, or None if unknown or older than max_age seconds."""
+        with self.lock:
+            row = self.conn.execute("SELECT publication_name, resolved_at FROM domains WHERE host = ?", (host,)).fetchone()
+        if not row or (max_age is not None and time.time() - row[1] > max_age):
+            return None
+        return row[0]
+
+    def save_domain_name(self, host, publication_name):
+        with self.lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO domains (host, publication_name, resolved_at) VALUES (?, ?, ?)",
+                              (host, publication_name, time.time()))
+
+    # Host health
+
+    _HOST_COLUMNS = ("latency", "failures", "total_requests", "total_failures", "state", "opened_at")
+
+    def get_host_health(self, host):
+        """Return the stored health of host as a dict, or None if it has never been fetched."""
+        with self.lock:
+            row = self.conn.execute(
+                f"SELECT {', '.join(self._HOST_COLUMNS)} FROM hosts WHERE host = ?", (host,)
+            ).fetchone()
+        return dict(zip(self._HOST_COLUMNS, row)) if row else None
+
+    def save_host_health(self, host, health):
+        with self.lock, self.conn:
+            self.conn.execute(
+                f"INSERT OR REPLACE INTO hosts (host, {', '.join(self._HOST_COLUMNS)}, updated_at) "
+                f"VALUES (?, {', '.join('?' * len(self._HOST_COLUMNS))}, ?)",
+                (host, *(health.get(c) for c in self._HOST_COLUMNS), time.time()),
+            )
+
+    # Feed state
+
+    def get_feed_states(self, urls):
+        """Return {url: state} with the stored ETag, Last-Modified, last entry ID and pending entries per feed."""
+        states = {}
+        with self.lock:
+            for chunk in _chunks(set(urls)):
+                placeholders = ",".join("?" * len(chunk))
+                rows = self.conn.execute(
+                    f"SELECT url, etag, modified, last_entry_id, pending_entries FROM feeds WHERE url IN ({placeholders})", chunk
+                )
+                for row in rows:
+                    states[row[0]] = {
+                        "etag": row[1],
+                        "modified": row[2],
+                        "last_entry_id": row[3],
+                        "pending_entries": json.loads(row[4]) if row[4] else [],
+                    }
+        return states
+
+    def save_feed_states(self, states):
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO feeds (url, etag, modified, last_entry_id, pending_entries, fetched_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(url, s.get("etag"), s.get("modified"), s.get("last_entry_id"), json.dumps(s.get("pending_entries") or []), now)
+                 for url, s in states.items()],
+            )
+
+_storages = {}
+_storages_lock = threading.Lock()
+
+def get_storage(db_path):
+    """Return the shared Storage for db_path, opening and migrating it on first use."""
+    with _storages_lock:
+        storage = _storages.get(db_path)
+        if storage is None:
+            storage = Storage(db_path)
+            _storages[db_path] = storage
+        return storage
+
+def ensure_models_table_and_get_device(db_path):
+    value = get_storage(db_path).get_setting('cpu_model')
+    device = None
+    if value is not None:
+        device = _parse_device(value)
+        print(f"Loaded device from Models table: {device}")
+    return device
+
+def save_device_to_models_table(db_path, device):
+    get_storage(db_path).set_setting('cpu_model', device)
+    print(f"Saved device to Models table: {device}")
+
+def save_backend_to_models_table(db_path, backend):
+    get_storage(db_path).set_setting('inference_backend', backend)
+    print(f"Saved inference backend to Models table: {backend}")
+
+def save_worker_layout_to_models_table(db_path, layout):
+    get_storage(db_path).set_setting('worker_layout', json.dumps(layout))
+    print(f"Saved worker layout to Models table: {layout['workers']} workers x {layout['threads_per_worker']} threads")
+
+def get_existing_urls(db_path, candidates):
+    return get_storage(db_path).existing_urls(candidates)
+
+def get_existing_canonical_urls(db_path, candidates):
+    return get_storage(db_path).existing_canonical_urls(candidates)
+
+def get_known_duplicates(db_path, candidates):
+    return get_storage(db_path).known_duplicates(candidates)
+
+def save_duplicate(db_path, url, duplicate_of, similarity=None):
+    get_storage(db_path).save_duplicate(url, duplicate_of, similarity)
+
+def get_story_summary(db_path, url):
+    return get_storage(db_path).get_story_summary(url)
+
+def save_to_db(db_path, records):
+    print(f"Saving {len(records)} records to the database...")  # Debug print
+    with metrics.span("db_write", records=len(records)):
+        inserted = get_storage(db_path).save_stories(records, store_body=STORE_BODY)
+    print(f"Records saved to database ({inserted} new).")  # Debug print
+
+def iter_stories(db_path, start_date, end_date):
+    return get_storage(db_path).iter_stories(start_date, end_date)
+
+def save_issue_headline(db_path, issue_date, headline):
+    get_storage(db_path).save_issue(issue_date, headline)
+
+def get_issue_headline(db_path, issue_date):
+    return get_storage(db_path).get_issue_headline(issue_date)
+
+def search_stories(db_path, query, limit=20):
+    return get_storage(db_path).search(query, limit)
+
+def get_cached_summary(db_path, key):
+    return get_storage(db_path).get_cached_summary(key)
+
+def save_cached_summary(db_path, key, summary, max_bytes=None):
+    get_storage(db_path).save_cached_summary(key, summary, max_bytes)
+
+def get_cached_pages(db_path, urls):
+    return get_storage(db_path).get_cached_pages(urls)
+
+def save_cached_page(db_path, page):
+    get_storage(db_path).save_cached_page(page)
+
+def save_page_extraction(db_path, url, text, authors):
+    get_storage(db_path).save_page_extraction(url, text, authors)
+
+def get_domain_name(db_path, host, max_age=None):
+    return get_storage(db_path).get_domain_name(host, max_age)
+
+def save_domain_name(db_path, host, publication_name):
+    get_storage(db_path).save_domain_name(host, publication_name)
+
+def get_host_health(db_path, host):
+    return get_storage(db_path).get_host_health(host)
+
+def save_host_health(db_path, host, health):
+    get_storage(db_path).save_host_health(host, health)
+
+def get_feed_states(db_path, urls):
+    return get_storage(db_path).get_feed_states(urls)
+
+def save_feed_states(db_path, states):
+    get_storage(db_path).save_feed_states(states)
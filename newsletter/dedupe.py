@@ -0,0 +1,142 @@
+import hashlib
+import re
+import zlib
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+import config
+
+NEAR_DUPLICATE_ACTION = getattr(config, "NEAR_DUPLICATE_ACTION", "skip")
+NEAR_DUPLICATE_THRESHOLD = getattr(config, "NEAR_DUPLICATE_THRESHOLD", 0.8)
+
+# MinHash signature length and LSH banding; 16 bands of 4 rows puts the
+# candidate threshold near a Jaccard similarity of 0.5, below the verify threshold.
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_WORDS = 5
+_PRIME = (1 << 31) - 1
+
+TRACKING_PARAMS = {
+    "fbclid", "gclid", "dclid", "msclkid", "mc_cid", "mc_eid", "igshid", "yclid",
+    "ref", "ref_src", "ref_url", "cmpid", "cmp", "smid", "sr_share", "share",
+    "ncid", "ocid", "spm", "taid", "mbid", "outputtype", "amp",
+}
+
+def canonicalize_url(url):
+    """Normalize a URL so tracking and AMP variants of a page compare equal.
+
+    Lowercases scheme and host, drops "www." / "amp." / "m." host prefixes,
+    utm_* and other tracking parameters, fragments, AMP path segments and
+    trailing slashes, and sorts the remaining query parameters.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower() or "http"
+    if scheme == "http":
+        scheme = "https"
+    host = parts.netloc.lower()
+    for prefix in ("www.", "amp.", "m."):
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+    if host.endswith(":443") or host.endswith(":80"):
+        host = host.rsplit(":", 1)[0]
+    # AMP pages: /amp/story, /story/amp, /story.amp, /story.amp.html
+    segments = [s for s in parts.path.split("/") if s and s.lower() != "amp"]
+    path = "/" + "/".join(segments)
+    path = re.sub(r"\.amp(\.html?)?$", r"\1", path, flags=re.IGNORECASE)
+    query = sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith("utm_") and k.lower() not in TRACKING_PARAMS
+    )
+    return urlunsplit((scheme, host, path, urlencode(query), ""))
+
+def _shingle_hashes(text):
+    words = re.findall(r"[a-z0-9']+", text.lower())
+    if len(words) < SHINGLE_WORDS:
+        grams = words
+    else:
+        grams = (" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1))
+    return {zlib.crc32(g.encode("utf-8")) for g in grams}
+
+_permutations = None
+
+def _get_permutations():
+    global _permutations
+    if _permutations is None:
+        import numpy as np
+        # Fixed seed: signatures must be comparable across runs
+        rng = np.random.RandomState(20240501)
+        a = rng.randint(1, _PRIME, size=NUM_PERM).astype(np.uint64)
+        b = rng.randint(0, _PRIME, size=NUM_PERM).astype(np.uint64)
+        _permutations = (a, b)
+    return _permutations
+
+def minhash_signature(text):
+    """Return a NUM_PERM-long uint32 MinHash signature of the text's word shingles, or None if empty."""
+    import numpy as np
+    hashes = _shingle_hashes(text)
+    if not hashes:
+        return None
+    a, b = _get_permutations()
+    x = np.fromiter(hashes, dtype=np.uint64, count=len(hashes))
+    # (a * x + b) mod p for every permutation and shingle at once; fits in uint64
+    return ((a[:, None] * x[None, :] + b[:, None]) % _PRIME).min(axis=1).astype(np.uint32)
+
+def lsh_buckets(signature):
+    """Return [(band, bucket)] keys for the signature's LSH bands."""
+    return [
+        (band, hashlib.md5(signature[band * ROWS:(band + 1) * ROWS].tobytes()).hexdigest()[:16])
+        for band in range(BANDS)
+    ]
+
+def signature_similarity(sig_a, sig_b):
+    """Estimated Jaccard similarity of two MinHash signatures."""
+    return float((sig_a == sig_b).mean())
+
+def signature_from_bytes(data):
+    import numpy as np
+    return np.frombuffer(data, dtype=np.uint32)
+
+class DuplicateDetector:
+    """Find near-duplicate articles within a run and against stored history.
+
+    Signatures of this run's articles live in an in-memory LSH index; stored
+    stories are looked up through the indexed fingerprints table.  Only
+    articles that share an LSH bucket are compared, so lookups stay
+    sublinear in the size of the history.
+    """
+
+    def __init__(self, db_path, threshold=None):
+        from newsletter.db import get_storage
+        self.storage = get_storage(db_path)
+        self.threshold = NEAR_DUPLICATE_THRESHOLD if threshold is None else threshold
+        self._buckets = {}
+        self._signatures = {}
+
+    def check(self, record):
+        """Fingerprint record (stored as record["minhash"]) and return (duplicate_url, similarity, where).
+
+        ``where`` is "run" or "history"; duplicate_url is None when the
+        article is new, in which case it joins the in-run index.
+        """
+        signature = minhash_signature(record.get("body") or "")
+        record["minhash"] = signature
+        if signature is None:
+            return None, 0.0, None
+        buckets = lsh_buckets(signature)
+        best_url, best_sim, where = None, 0.0, None
+        run_candidates = {url for key in buckets for url in self._buckets.get(key, ())}
+        for url in run_candidates:
+            sim = signature_similarity(signature, self._signatures[url])
+            if sim > best_sim:
+                best_url, best_sim, where = url, sim, "run"
+        for url, stored in self.storage.similar_signatures(buckets).items():
+            if url == record["url"]:
+                continue
+            sim = signature_similarity(signature, signature_from_bytes(stored))
+            if sim > best_sim:
+                best_url, best_sim, where = url, sim, "history"
+        if best_url is not None and best_sim >= self.threshold:
+            return best_url, best_sim, where
+        self._signatures[record["url"]] = signature
+        for key in buckets:
+            self._buckets.setdefault(key, []).append(record["url"])
+        return None, best_sim, None
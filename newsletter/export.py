@@ -0,0 +1,171 @@
+import datetime
+import html
+import json
+import os
+import config
+from config import NEWSLETTER_HEADLINE, APPEND_DATE_TO_HEADLINE, INCLUDE_DISCLAIMER, DISCLAIMER_TEXT
+from newsletter.db import iter_stories, get_issue_headline
+
+EXPORT_FORMATS = getattr(config, "EXPORT_FORMATS", ["markdown"])
+
+def _clean_headline(headline):
+    return headline.replace('\n', ' ').replace('\r', ' ')
+
+def _format_pubdate(pubdate):
+    try:
+        return datetime.datetime.strptime(pubdate, "%Y-%m-%d").strftime("%m/%d/%y")
+    except Exception:
+        return pubdate
+
+class MarkdownRenderer:
+    extension = "md"
+
+    def begin(self, f, title):
+        f.write(f"# {title}\n\n")
+
+    def item(self, f, rec):
+        headline = _clean_headline(rec['headline']).replace('[', '\\[').replace(']', '\\]')
+        # Headline as a link, then two spaces and newline
+        f.write(f"[{headline}]({rec['url']})  \n")
+        # Source, hyphen, pubdate (mm/dd/yy), then two spaces and newline
+        f.write(f"{rec.get('source') or ''} - {_format_pubdate(rec['publication_date'])}  \n")
+        f.write(f"{rec['summary']}\n")
+        f.write("\n---\n\n")
+
+    def end(self, f):
+        if INCLUDE_DISCLAIMER and DISCLAIMER_TEXT:
+            f.write(f"{DISCLAIMER_TEXT}\n")
+
+class HtmlRenderer:
+    extension = "html"
+
+    def begin(self, f, title):
+        f.write("<!DOCTYPE html>\n<html lang=\"en\">\n<head>\n<meta charset=\"utf-8\">\n")
+        f.write(f"<title>{html.escape(title)}</title>\n</head>\n<body>\n<h1>{html.escape(title)}</h1>\n")
+
+    def item(self, f, rec):
+        f.write("<article>\n")
+        f.write(f"<h2><a href=\"{html.escape(rec['url'])}\">{html.escape(_clean_headline(rec['headline']))}</a></h2>\n")
+        meta = f"{rec.get('source') or ''} - {_format_pubdate(rec['publication_date'])}"
+        f.write(f"<p class=\"meta\">{html.escape(meta)}</p>\n")
+        f.write(f"<p>{html.escape(rec['summary'] or '')}</p>\n")
+        f.write("</article>\n<hr>\n")
+
+    def end(self, f):
+        if INCLUDE_DISCLAIMER and DISCLAIMER_TEXT:
+            f.write(f"<footer><p>{html.escape(DISCLAIMER_TEXT)}</p></footer>\n")
+        f.write("</body>\n</html>\n")
+
+class JsonFeedRenderer:
+    """JSON Feed 1.1, written item by item rather than built as one object."""
+
+    extension = "json"
+
+    def __init__(self):
+        self._first = True
+
+    def begin(self, f, title):
+        f.write('{"version": "https://jsonfeed.org/version/1.1", ')
+        f.write(f'"title": {json.dumps(title)}, ')
+        if INCLUDE_DISCLAIMER and DISCLAIMER_TEXT:
+            f.write(f'"description": {json.dumps(DISCLAIMER_TEXT)}, ')
+        f.write('"items": [\n')
+
+    def item(self, f, rec):
+        item = {
+            "id": rec["url"],
+            "url": rec["url"],
+            "title": _clean_headline(rec["headline"]),
+            "content_text": rec["summary"] or "",
+        }
+        try:
+            published = datetime.datetime.strptime(rec["publication_date"], "%Y-%m-%d")
+            item["date_published"] = published.strftime("%Y-%m-%dT00:00:00Z")
+        except (TypeError, ValueError):
+            pass
+        if rec.get("author"):
+            item["authors"] = [{"name": rec["author"]}]
+        if rec.get("source"):
+            item["_newsletter"] = {"source": rec["source"]}
+        f.write(("" if self._first else ",\n") + json.dumps(item, ensure_ascii=False))
+        self._first = False
+
+    def end(self, f):
+        f.write("\n]}\n")
+
+RENDERERS = {
+    "markdown": MarkdownRenderer,
+    "html": HtmlRenderer,
+    "json": JsonFeedRenderer,
+}
+
+def issue_title(summary_headline="", headline_date=None):
+    """Compose the top headline: NEWSLETTER_HEADLINE, the generated headline, then the date."""
+    title = NEWSLETTER_HEADLINE
+    if summary_headline:
+        title = f"{NEWSLETTER_HEADLINE} {summary_headline}"
+    if APPEND_DATE_TO_HEADLINE and headline_date:
+        title = f"{title} {headline_date}"
+    return title
+
+def export_issue(records, export_path, formats=None, summary_headline="", name=None, headline_date=None):
+    """Render one record stream to every requested format in a single pass.
+
+    ``records`` may be any iterable (a list or a database cursor); each
+    record is written to all open files and then dropped, so memory use
+    does not grow with the number of records.  Files are named
+    ``<name>.<ext>``, by default ``newsletter_YYYYMMDD``.  Returns the
+    filenames written.
+    """
+    print("Exporting records...")  # Debug print
+    formats = formats or EXPORT_FORMATS
+    unknown = [fmt for fmt in formats if fmt not in RENDERERS]
+    if unknown:
+        raise ValueError(f"Unknown export format(s): {', '.join(unknown)} (expected {', '.join(RENDERERS)})")
+    now = datetime.datetime.now()
+    name = name or f"newsletter_{now.strftime('%Y%m%d')}"
+    if headline_date is None:
+        headline_date = now.strftime("%A %B %d")
+    title = issue_title(summary_headline, headline_date)
+    outputs = []
+    try:
+        for fmt in formats:
+            renderer = RENDERERS[fmt]()
+            filename = os.path.join(export_path, f"{name}.{renderer.extension}")
+            f = open(filename, "w", encoding="utf-8")
+            outputs.append((renderer, f, filename))
+            renderer.begin(f, title)
+        count = 0
+        for rec in records:
+            for renderer, f, _ in outputs:
+                renderer.item(f, rec)
+            count += 1
+        for renderer, f, _ in outputs:
+            renderer.end(f)
+    finally:
+        for _, f, _ in outputs:
+            f.close()
+    filenames = [filename for _, _, filename in outputs]
+    for filename in filenames:
+        print(f"Exported {count} records to {filename}")
+    return filenames
+
+def export_archive(db_path, start_date, end_date, export_path, formats=None):
+    """Regenerate the issue of one day, or a digest of a date range, straight from the stories table.
+
+    Stories are streamed from a database cursor.  A single-day issue keeps
+    its stored generated headline.
+    """
+    if end_date < start_date:
+        raise ValueError(f"End date {end_date} is before start date {start_date}")
+    if start_date == end_date:
+        name = f"newsletter_{start_date.strftime('%Y%m%d')}"
+        headline_date = start_date.strftime("%A %B %d")
+        summary_headline = get_issue_headline(db_path, start_date.isoformat()) or ""
+    else:
+        name = f"newsletter_{start_date.strftime('%Y%m%d')}-{end_date.strftime('%Y%m%d')}"
+        headline_date = f"{start_date.strftime('%B %d')} - {end_date.strftime('%B %d')}"
+        summary_headline = ""
+    records = iter_stories(db_path, start_date.isoformat(), end_date.isoformat())
+    return export_issue(records, export_path, formats, summary_headline=summary_headline,
+                        name=name, headline_date=headline_date)
@@ -0,0 +1,103 @@
+# Extractive summarization: pick the most central sentences of a text.
+# Sentences are scored on a NumPy TF-IDF matrix, by similarity to the
+# document centroid ("tfidf") or by TextRank over the sentence similarity
+# graph ("textrank").  It costs milliseconds per article, so it serves as
+# a cheap tier, a fallback when the model fails, and a way to shrink
+# inputs before they reach the model.
+import re
+import config
+
+EXTRACTIVE_METHOD = getattr(config, "EXTRACTIVE_METHOD", "textrank")
+EXTRACTIVE_METHODS = ("textrank", "tfidf")
+
+TEXTRANK_DAMPING = 0.85
+TEXTRANK_ITERATIONS = 50
+
+_SENTENCE_RE = re.compile(r'(?<=[.!?])["\')\]]*\s+(?=["\'(\[]*[A-Z0-9])')
+_WORD_RE = re.compile(r"[a-z0-9']+")
+STOPWORDS = frozenset("""
+a about above after again against all also am an and any are as at be because been before being below between
+both but by can could did do does doing down during each few for from further had has have having he her here
+hers herself him himself his how i if in into is it its itself just me more most my myself no nor not now of off
+on once only or other our ours ourselves out over own said same she should so some such than that the their
+theirs them themselves then there these they this those through to too under until up very was we were what
+when where which while who whom why will with would you your yours yourself yourselves
+""".split())
+
+def split_sentences(text):
+    """Split text into sentences on terminal punctuation and line breaks."""
+    sentences = []
+    for block in re.split(r"\n\s*\n|\n", text):
+        sentences.extend(s.strip() for s in _SENTENCE_RE.split(block) if s.strip())
+    return sentences
+
+def _tfidf_matrix(sentences):
+    """Return an L2-normalized (sentences x terms) TF-IDF matrix."""
+    import numpy as np
+    vocab = {}
+    rows = []
+    cols = []
+    for i, sentence in enumerate(sentences):
+        for word in _WORD_RE.findall(sentence.lower()):
+            if word in STOPWORDS:
+                continue
+            rows.append(i)
+            cols.append(vocab.setdefault(word, len(vocab)))
+    tf = np.zeros((len(sentences), max(1, len(vocab))))
+    np.add.at(tf, (np.array(rows, dtype=int), np.array(cols, dtype=int)), 1.0)
+    df = np.count_nonzero(tf, axis=0)
+    idf = np.log((1.0 + len(sentences)) / (1.0 + df)) + 1.0
+    x = tf * idf
+    norms = np.linalg.norm(x, axis=1, keepdims=True)
+    return x / np.where(norms > 0, norms, 1.0)
+
+def score_sentences(sentences, method=None):
+    """Return a NumPy array with one centrality score per sentence."""
+    import numpy as np
+    method = method or EXTRACTIVE_METHOD
+    if method not in EXTRACTIVE_METHODS:
+        raise ValueError(f"Unknown extractive method: {method!r} (expected one of {', '.join(EXTRACTIVE_METHODS)})")
+    n = len(sentences)
+    if n == 0:
+        return np.zeros(0)
+    x = _tfidf_matrix(sentences)
+    if method == "tfidf" or n == 1:
+        return x @ x.mean(axis=0)
+    similarity = x @ x.T
+    np.fill_diagonal(similarity, 0.0)
+    out_weight = similarity.sum(axis=1, keepdims=True)
+    # Sentences sharing no terms with the rest link uniformly, so every row stays stochastic
+    transition = np.where(out_weight > 0, similarity / np.where(out_weight > 0, out_weight, 1.0), 1.0 / n)
+    rank = np.full(n, 1.0 / n)
+    for _ in range(TEXTRANK_ITERATIONS):
+        updated = (1.0 - TEXTRANK_DAMPING) / n + TEXTRANK_DAMPING * (transition.T @ rank)
+        if np.abs(updated - rank).sum() < 1e-6:
+            rank = updated
+            break
+        rank = updated
+    return rank
+
+def extract_sentences(text, max_words, method=None):
+    """Return the highest-scoring sentences that fit in max_words, in their original order.
+
+    Sentences that would overflow the budget are skipped in favour of
+    shorter lower-ranked ones; if even the best sentence is too long it is
+    returned on its own.
+    """
+    import numpy as np
+    sentences = split_sentences(text)
+    if not sentences:
+        return ""
+    lengths = [len(s.split()) for s in sentences]
+    if sum(lengths) <= max_words:
+        return " ".join(sentences)
+    scores = score_sentences(sentences, method)
+    chosen = []
+    used = 0
+    for i in np.argsort(-scores, kind="stable"):
+        if used + lengths[i] <= max_words:
+            chosen.append(i)
+            used += lengths[i]
+    if not chosen:
+        chosen = [int(np.argmax(scores))]
+    return " ".join(sentences[i] for i in sorted(chosen))
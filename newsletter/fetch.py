@@ -0,0 +1,287 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+import config
+from newsletter.db import get_cached_pages, save_cached_page
+from newsletter import metrics
+from newsletter.hosts import get_host_registry, backoff_delay, FETCH_RETRIES, RETRY_STATUSES
+
+FETCH_WORKERS = getattr(config, "FETCH_WORKERS", 8)
+FETCH_PER_HOST_LIMIT = getattr(config, "FETCH_PER_HOST_LIMIT", 2)
+FETCH_TIMEOUT = getattr(config, "FETCH_TIMEOUT", 10)
+FETCH_TOTAL_BUDGET = getattr(config, "FETCH_TOTAL_BUDGET", 120)
+PAGE_CACHE_OFFLINE = getattr(config, "PAGE_CACHE_OFFLINE", False)
+# Stop reading a page for its <head> after this many bytes even if </head> never arrives
+HEAD_MAX_BYTES = 256 * 1024
+HEAD_CHUNK_SIZE = 16 * 1024
+
+# Use stealth headers to appear as a real browser
+HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+        "AppleWebKit/537.36 (KHTML, like Gecko) "
+        "Chrome/120.0.0.0 Safari/537.36"
+    ),
+    "Accept-Language": "en-US,en;q=0.9",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
+    "Connection": "keep-alive",
+    "DNT": "1",
+    "Upgrade-Insecure-Requests": "1",
+}
+
+_session = None
+_session_lock = threading.Lock()
+_host_locks = {}
+_host_locks_guard = threading.Lock()
+
+def get_session():
+    """Return the process-wide pooled HTTP session."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            pool_size = max(FETCH_WORKERS, 10)
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers.update(HEADERS)
+            _session = session
+        return _session
+
+def _host_semaphore(host, per_host_limit):
+    with _host_locks_guard:
+        sem = _host_locks.get(host)
+        if sem is None:
+            sem = threading.BoundedSemaphore(max(1, per_host_limit))
+            _host_locks[host] = sem
+        return sem
+
+def _request(url, headers=None, timeout=None, per_host_limit=None, db_path=None, stream=False, span="page_download"):
+    """GET url through the shared session with retries; returns the response or None.
+
+    Requests to a host whose circuit is open are refused at once.  The
+    first attempt uses the host's adaptive timeout (capped at ``timeout``);
+    timeouts, connection errors and RETRY_STATUSES are retried up to
+    FETCH_RETRIES times with the full timeout, after a jittered backoff
+    taken outside the per-host slot.  Only a URL that still fails after its
+    retries counts against the host, once.  Any other status is returned
+    for the caller to handle.
+    """
+    if timeout is None:
+        timeout = FETCH_TIMEOUT
+    if per_host_limit is None:
+        per_host_limit = FETCH_PER_HOST_LIMIT
+    host = urlparse(url).netloc.lower()
+    registry = get_host_registry(db_path)
+    if not registry.allow(host):
+        print(f"Skipping {url}: {host} is failing (circuit open)")  # Debug print
+        metrics.incr("hosts_skipped")
+        return None
+    error = None
+    network_error = False
+    for attempt in range(FETCH_RETRIES + 1):
+        if attempt and registry.is_open(host):
+            # Other pages on the host opened the circuit while this one was backing off
+            break
+        attempt_timeout = registry.timeout(host, timeout) if attempt == 0 else timeout
+        retry_after = None
+        started = time.monotonic()
+        with _host_semaphore(host, per_host_limit), metrics.span(span, host=host):
+            try:
+                resp = get_session().get(url, headers=headers, timeout=attempt_timeout, stream=stream)
+            except (requests.Timeout, requests.ConnectionError) as e:
+                resp = None
+                error = e
+                network_error = True
+            except requests.RequestException as e:
+                registry.release(host)
+                print(f"Error fetching {url}: {e}")
+                metrics.incr("page_fetch_errors")
+                return None
+        if resp is not None:
+            if resp.status_code not in RETRY_STATUSES:
+                registry.record_success(host, time.monotonic() - started)
+                return resp
+            error = f"HTTP {resp.status_code}"
+            network_error = False
+            retry_after = resp.headers.get("Retry-After")
+            resp.close()
+        if attempt < FETCH_RETRIES:
+            metrics.incr("fetch_retries")
+            time.sleep(backoff_delay(attempt, retry_after))
+    registry.record_failure(host, url, network_error)
+    print(f"Error fetching {url}: {error}")
+    metrics.incr("page_fetch_errors")
+    return None
+
+def fetch_page(url, cached=None, timeout=None, per_host_limit=None, db_path=None):
+    """Download a page through the shared session.
+
+    When ``cached`` (a page from the page cache) is given, a conditional
+    request is sent and the cached page is returned with ``not_modified``
+    set if the server answers 304.  With ``db_path`` host health is kept in
+    that database (see _request).  Returns a page dict or None on failure.
+    """
+    headers = {}
+    if cached:
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+    resp = _request(url, headers, timeout, per_host_limit, db_path)
+    if resp is None:
+        return None
+    try:
+        metrics.incr("bytes_fetched", len(resp.content))
+        if resp.status_code == 304 and cached:
+            metrics.incr("pages_not_modified")
+            return dict(cached, not_modified=True)
+        resp.raise_for_status()
+    except requests.RequestException as e:
+        print(f"Error fetching {url}: {e}")
+        metrics.incr("page_fetch_errors")
+        return None
+    return {
+        "url": url,
+        "html": resp.text,
+        "text": None,
+        "authors": None,
+        "etag": resp.headers.get("ETag"),
+        "last_modified": resp.headers.get("Last-Modified"),
+        "not_modified": False,
+    }
+
+def parse_head_meta(chunks):
+    """Read og:site_name, twitter:site and <title> from a stream of HTML chunks.
+
+    Chunks (str or bytes; a whole document is split up) are fed to lxml's
+    incremental HTML parser and reading stops as soon as the head is
+    closed, so the body is never parsed.  Returns {"og:site_name",
+    "twitter:site", "title"} with the values found.
+    """
+    from lxml import etree
+    if isinstance(chunks, (str, bytes)):
+        chunks = _iter_text_chunks(chunks)
+    parser = etree.HTMLPullParser(events=("start", "end"))
+    found = {}
+    for chunk in chunks:
+        parser.feed(chunk)
+        for event, element in parser.read_events():
+            tag = element.tag.lower() if isinstance(element.tag, str) else ""
+            if event == "end" and tag == "meta":
+                key = (element.get("property") or element.get("name") or "").lower()
+                content = (element.get("content") or "").strip()
+                if key in ("og:site_name", "twitter:site") and content:
+                    found.setdefault(key, content)
+            elif event == "end" and tag == "title" and element.text and element.text.strip():
+                found.setdefault("title", element.text.strip())
+            elif (event == "end" and tag == "head") or (event == "start" and tag == "body"):
+                return found
+    return found
+
+def _iter_text_chunks(html, size=HEAD_CHUNK_SIZE):
+    for i in range(0, len(html), size):
+        yield html[i:i + size]
+
+def _iter_capped_chunks(resp, received):
+    for chunk in resp.iter_content(chunk_size=HEAD_CHUNK_SIZE):
+        received["bytes"] += len(chunk)
+        yield chunk
+        if received["bytes"] >= HEAD_MAX_BYTES:
+            return
+
+def fetch_head_meta(url, timeout=None, per_host_limit=None, db_path=None):
+    """Stream a page only until its </head> and return parse_head_meta's result, or None on failure."""
+    resp = _request(url, timeout=timeout, per_host_limit=per_host_limit, db_path=db_path,
+                    stream=True, span="head_download")
+    if resp is None:
+        return None
+    try:
+        with resp:
+            resp.raise_for_status()
+            received = {"bytes": 0}
+            found = parse_head_meta(_iter_capped_chunks(resp, received))
+            metrics.incr("bytes_fetched", received["bytes"])
+            return found
+    except requests.RequestException as e:
+        print(f"Error fetching {url}: {e}")
+        metrics.incr("page_fetch_errors")
+        return None
+
+def fetch_url(url, timeout=None, per_host_limit=None, db_path=None):
+    """Download a single page through the shared session; returns HTML or None."""
+    page = fetch_page(url, timeout=timeout, per_host_limit=per_host_limit, db_path=db_path)
+    return page["html"] if page else None
+
+def iter_pages(urls, max_workers=None, per_host_limit=None, total_budget=None, db_path=None, offline=None):
+    """Download many URLs in parallel, each exactly once, yielding as they finish.
+
+    Yields (url, page) pairs in completion order; page is None if the
+    download failed or did not finish inside ``total_budget`` seconds.
+    With ``db_path``, pages are revalidated against the page cache and new
+    downloads are stored; with ``offline`` only cached pages are returned.
+    """
+    if max_workers is None:
+        max_workers = FETCH_WORKERS
+    if total_budget is None:
+        total_budget = FETCH_TOTAL_BUDGET
+    if offline is None:
+        offline = PAGE_CACHE_OFFLINE
+    urls = list(dict.fromkeys(urls))
+    if not urls:
+        return
+    cached_pages = get_cached_pages(db_path, urls) if db_path else {}
+    if offline:
+        print(f"Offline replay: {len(cached_pages)}/{len(urls)} articles found in page cache.")  # Debug print
+        for url in urls:
+            page = cached_pages.get(url)
+            yield url, dict(page, not_modified=True) if page else None
+        return
+    print(f"Downloading {len(urls)} articles with {max_workers} workers...")  # Debug print
+    started = time.monotonic()
+    deadline = started + total_budget
+    executor = ThreadPoolExecutor(max_workers=max(1, max_workers))
+    futures = {
+        executor.submit(fetch_page, url, cached_pages.get(url), None, per_host_limit, db_path): url
+        for url in urls
+    }
+    pending = set(futures)
+    fetched = 0
+    not_modified = 0
+    try:
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for fut in done:
+                page = fut.result()
+                if page is not None:
+                    fetched += 1
+                    if page["not_modified"]:
+                        not_modified += 1
+                    elif db_path:
+                        save_cached_page(db_path, page)
+                yield futures[fut], page
+        if pending:
+            print(f"Fetch budget of {total_budget}s exhausted; {len(pending)} downloads abandoned.")
+            for fut in pending:
+                fut.cancel()
+                yield futures[fut], None
+    finally:
+        # Also reached when the caller stops early; downloads not yet started are dropped
+        executor.shutdown(wait=False, cancel_futures=True)
+    print(f"Downloaded {fetched}/{len(urls)} articles ({not_modified} not modified) in {time.monotonic() - started:.1f}s")  # Debug print
+
+def fetch_pages(urls, max_workers=None, per_host_limit=None, total_budget=None, db_path=None, offline=None):
+    """Download many URLs in parallel, each exactly once.
+
+    Returns a dict mapping url -> page dict (or None if the download failed
+    or did not finish inside ``total_budget`` seconds).  See iter_pages.
+    """
+    results = {url: None for url in urls}
+    results.update(iter_pages(urls, max_workers, per_host_limit, total_budget, db_path, offline))
+    return results
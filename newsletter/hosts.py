@@ -0,0 +1,178 @@
+import random
+import threading
+import time
+import config
+from newsletter.db import get_host_health, save_host_health
+from newsletter import metrics
+
+FETCH_RETRIES = getattr(config, "FETCH_RETRIES", 2)
+FETCH_BACKOFF_BASE = getattr(config, "FETCH_BACKOFF_BASE", 0.5)
+FETCH_MIN_TIMEOUT = getattr(config, "FETCH_MIN_TIMEOUT", 3)
+HOST_FAILURE_THRESHOLD = getattr(config, "HOST_FAILURE_THRESHOLD", 3)
+HOST_COOLDOWN_SECONDS = getattr(config, "HOST_COOLDOWN_SECONDS", 6 * 3600)
+
+# Longest single backoff sleep, in seconds
+BACKOFF_MAX = 8.0
+# Weight of the newest response time in a host's latency average
+LATENCY_ALPHA = 0.3
+# A known host's timeout is this multiple of its average response time
+TIMEOUT_FACTOR = 4.0
+# Statuses that mean the host is struggling, as opposed to the page being missing
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+# How much a page failing with RETRY_STATUSES adds to the host's failure streak;
+# a timeout or connection error adds 1.  One broken page gets a 5xx, a down host does not answer.
+STATUS_FAILURE_WEIGHT = 0.5
+# Share of this run's pages from a host that must have failed before its circuit opens,
+# so a site with a few broken pages is not shut off once its good pages are done
+OPEN_FAILURE_RATIO = 0.5
+
+def backoff_delay(attempt, retry_after=None):
+    """Seconds to sleep before retrying after failed attempt number ``attempt`` (0-based).
+
+    Full jitter: uniform between zero and an exponentially growing cap, so
+    workers retrying the same host do not line up.  A numeric Retry-After
+    header is honoured, up to BACKOFF_MAX.
+    """
+    if retry_after:
+        try:
+            return min(BACKOFF_MAX, max(0.0, float(retry_after)))
+        except ValueError:
+            pass
+    return random.uniform(0, min(BACKOFF_MAX, FETCH_BACKOFF_BASE * 2 ** attempt))
+
+def _new_health():
+    return {
+        "latency": None,
+        "failures": 0,
+        "total_requests": 0,
+        "total_failures": 0,
+        "state": "closed",
+        "opened_at": None,
+    }
+
+class HostRegistry:
+    """Health of every host fetched from, with a circuit breaker per host.
+
+    A host's circuit is closed while its requests succeed.  A failure is a
+    page that still fails after its retries; each distinct page counts once,
+    a timeout or connection error fully and a RETRY_STATUSES response by
+    STATUS_FAILURE_WEIGHT.  When the streak reaches HOST_FAILURE_THRESHOLD
+    without a success in between, and at least OPEN_FAILURE_RATIO of the
+    host's pages in this process have failed, the circuit opens and
+    requests to the host are refused without touching the network.  Once
+    HOST_COOLDOWN_SECONDS have passed it is half-open: a single request is
+    let through as a probe, which closes the circuit on success and reopens
+    it on failure.  Any response other than RETRY_STATUSES, even a 404,
+    shows the host is up.
+
+    With a db_path the state is read from and written through to the hosts
+    table, so a dead site found in one run is skipped in the next.
+    """
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        self.hosts = {}
+        self.probing = set()
+        # Pages counted in each host's current failure streak
+        self.failed_urls = {}
+        # [succeeded, failed] pages per host in this process
+        self.outcomes = {}
+
+    def _health(self, host):
+        health = self.hosts.get(host)
+        if health is None:
+            stored = get_host_health(self.db_path, host) if self.db_path else None
+            health = stored or _new_health()
+            self.hosts[host] = health
+        return health
+
+    def _save(self, host, health):
+        if self.db_path:
+            save_host_health(self.db_path, host, health)
+
+    def allow(self, host):
+        """Return True if a request to host may be sent now."""
+        with self.lock:
+            health = self._health(host)
+            if health["state"] == "closed":
+                return True
+            if health["state"] == "open":
+                if time.time() - (health["opened_at"] or 0) < HOST_COOLDOWN_SECONDS:
+                    return False
+                health["state"] = "half_open"
+            if host in self.probing:
+                return False
+            self.probing.add(host)
+            return True
+
+    def is_open(self, host):
+        with self.lock:
+            return self._health(host)["state"] == "open"
+
+    def timeout(self, host, cap):
+        """Timeout for a request to host: TIMEOUT_FACTOR x its average latency, within [FETCH_MIN_TIMEOUT, cap]."""
+        with self.lock:
+            latency = self._health(host)["latency"]
+        if latency is None:
+            return cap
+        return min(cap, max(FETCH_MIN_TIMEOUT, latency * TIMEOUT_FACTOR))
+
+    def record_success(self, host, elapsed):
+        with self.lock:
+            health = self._health(host)
+            if health["latency"] is None:
+                health["latency"] = elapsed
+            else:
+                health["latency"] = LATENCY_ALPHA * elapsed + (1 - LATENCY_ALPHA) * health["latency"]
+            health["failures"] = 0
+            health["total_requests"] += 1
+            self.outcomes.setdefault(host, [0, 0])[0] += 1
+            if health["state"] != "closed":
+                print(f"Host {host} is responding again; circuit closed.")  # Debug print
+            health["state"] = "closed"
+            health["opened_at"] = None
+            self.probing.discard(host)
+            self.failed_urls.pop(host, None)
+            self._save(host, health)
+
+    def record_failure(self, host, url, network_error=True):
+        """Record that url failed after its retries, by timeout/connection error or by RETRY_STATUSES."""
+        with self.lock:
+            health = self._health(host)
+            health["total_requests"] += 1
+            health["total_failures"] += 1
+            failed = self.failed_urls.setdefault(host, set())
+            outcomes = self.outcomes.setdefault(host, [0, 0])
+            if url not in failed:
+                failed.add(url)
+                outcomes[1] += 1
+                health["failures"] += 1 if network_error else STATUS_FAILURE_WEIGHT
+            mostly_failing = outcomes[1] >= OPEN_FAILURE_RATIO * sum(outcomes)
+            if health["state"] == "half_open" or (
+                health["state"] == "closed" and health["failures"] >= HOST_FAILURE_THRESHOLD and mostly_failing
+            ):
+                health["state"] = "open"
+                health["opened_at"] = time.time()
+                metrics.incr("circuits_opened")
+                print(f"Host {host} failed on {len(failed)} pages in a row; "
+                      f"skipping it for {HOST_COOLDOWN_SECONDS / 60:.0f} minutes.")  # Debug print
+            self.probing.discard(host)
+            self._save(host, health)
+
+    def release(self, host):
+        """End a half-open probe that failed for reasons unrelated to the host."""
+        with self.lock:
+            self.probing.discard(host)
+
+_registries = {}
+_registries_lock = threading.Lock()
+
+def get_host_registry(db_path=None):
+    """Return the shared HostRegistry for db_path; without one, health is kept for this process only."""
+    with _registries_lock:
+        registry = _registries.get(db_path)
+        if registry is None:
+            registry = HostRegistry(db_path)
+            _registries[db_path] = registry
+        return registry
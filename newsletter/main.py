@@ -1,102 +1,193 @@
+import time
+# Taken before the other imports so the reported startup time includes them
+PROCESS_STARTED = time.perf_counter()
 import os
 import sys
+import argparse
 import datetime
-from queue import Queue
-from config import RSS_URL, DB_PATH, EXPORT_PATH, MAX_ARTICLES_FOR_SELECTION, SUMMARY_MAX_WORDS
+import config
+from config import RSS_URL, DB_PATH, EXPORT_PATH, SUMMARY_MAX_WORDS
+from newsletter import metrics
+from newsletter.db import search_stories, save_issue_headline
+from newsletter.export import export_issue, export_archive, EXPORT_FORMATS, RENDERERS
 
-from newsletter.db import (
-    ensure_model_table_and_get_device,
-    ensure_models_table_and_get_device,
-    save_device_to_model_table,
-    save_device_to_models_table,
-    save_to_db,
-    get_existing_urls,
-)
 from newsletter.rss import fetch_instapaper_articles
-from newsletter.ui import select_articles_gui
+from newsletter.selection import get_selector
+from newsletter.pipeline import run_pipeline
+from newsletter.speculate import Speculator, SPECULATIVE_TOP_N, SPECULATIVE_PREVIEW
+from newsletter.daemon import daemon_available, submit_job
 from newsletter.summarize import (
-    detect_device,
-    get_summarizer_and_tokenizer,
-    process_article,
-    export_to_markdown,
+    SummarizerLoader,
+    SUMMARY_BATCH_SIZE,
+    resolve_device,
+    generate_summary_headline,
 )
 
-def main():
+METRICS_PATH = getattr(config, "METRICS_PATH", None)
+
+def run_session(selector):
     print("Starting newsletter processing session...")  # Debug print
 
-    # Device/model selection logic
-    device = ensure_models_table_and_get_device(DB_PATH)
-    if device is None:
-        device = ensure_model_table_and_get_device(DB_PATH)
-    if device is None:
-        device = detect_device()
-        save_device_to_models_table(DB_PATH, device)
-        save_device_to_model_table(DB_PATH, device)
+    articles = fetch_instapaper_articles(
+        RSS_URL, DB_PATH, selector.max_candidates
+    )
+    if not articles:
+        print("No articles found from the past 7 days.")
+        print(f"Startup time (no new articles): {time.perf_counter() - PROCESS_STARTED:.2f}s")
+        return
 
-    summarizer, tokenizer = get_summarizer_and_tokenizer(device)
+    # Load the model in the background while the picker is open; torch is not imported until here
+    loader = SummarizerLoader(lambda: resolve_device(DB_PATH))
+    prepared = None
+    if SPECULATIVE_TOP_N and selector.interactive:
+        # Summarize the likeliest picks while the user is still choosing
+        speculator = Speculator(articles, loader, DB_PATH, SUMMARY_MAX_WORDS)
+        selected = selector.select(articles, preview=speculator.preview if SPECULATIVE_PREVIEW else None)
+        prepared = speculator.take(selected)
+    else:
+        selected = selector.select(articles)
+    if not selected:
+        print("No articles selected.")
+        return
+
+    # Downloads, parsing, summarization and DB writes overlap; each batch is committed as it finishes
+    processed_records = run_pipeline(selected, loader, DB_PATH, SUMMARY_MAX_WORDS, batch_size=SUMMARY_BATCH_SIZE,
+                                     prepared=prepared)
 
+    if processed_records:
+        summarizer, _ = loader.get()
+        with metrics.span("headline"):
+            summary_headline = generate_summary_headline(summarizer, processed_records)
+        save_issue_headline(DB_PATH, datetime.date.today().isoformat(), summary_headline)
+        # Every format is written once, in one pass, with the headline
+        with metrics.span("export"):
+            export_issue(processed_records, EXPORT_PATH, EXPORT_FORMATS, summary_headline=summary_headline)
+    else:
+        print("No articles could be processed.")
+
+def run_client_session(selector):
+    """Pick articles locally and hand them to the running daemon, which has the model loaded."""
+    print("Newsletter daemon detected; submitting job to it...")  # Debug print
     articles = fetch_instapaper_articles(
-        RSS_URL, DB_PATH, MAX_ARTICLES_FOR_SELECTION
+        RSS_URL, DB_PATH, selector.max_candidates
     )
     if not articles:
         print("No articles found from the past 7 days.")
         return
-    selected = select_articles_gui(articles)
+    selected = selector.select(articles)
     if not selected:
         print("No articles selected.")
         return
+    for event in submit_job({"urls": selected, "export_path": EXPORT_PATH}):
+        if event["event"] == "summarized":
+            print(f"Summarized: {event['headline']}")
+        elif event["event"] == "exported":
+            print(f"Exported to {', '.join(event.get('paths') or [event['path']])}")
+        elif event["event"] == "error":
+            print(f"Daemon job failed: {event['error']}")
+        elif event["event"] == "done":
+            print(f"Processed {event['processed']} articles in {event['seconds']:.1f}s")
+        else:
+            print(f"Daemon: {event}")
 
-    print("Queueing selected articles for processing...")  # Debug print
-    q = Queue()
-    for art in selected:
-        q.put(art)
+def run_search(query, limit=20):
+    """Print stored stories matching query, best match first."""
+    results = search_stories(DB_PATH, query, limit)
+    if not results:
+        print(f"No stories match {query!r}.")
+        return
+    for i, res in enumerate(results, start=1):
+        details = ", ".join(part for part in (res["source"], res["publication_date"]) if part)
+        print(f"{i}. {res['headline']}" + (f" ({details})" if details else ""))
+        print(f"   {res['url']}")
+        if res["snippet"]:
+            print(f"   {' '.join(res['snippet'].split())}")
 
-    processed_records = []
-    while not q.empty():
-        art = q.get()
-        print(f"Processing headline: {art['title']}")  # Print headline before URL
-        print(f"Processing URL: {art['url']}")         # Debug print
-        data = process_article(art, summarizer, tokenizer, SUMMARY_MAX_WORDS)
-        if data:
-            processed_records.append(data)
-        q.task_done()
+def _parse_date(value):
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid date {value!r} (expected YYYY-MM-DD)")
 
-    if processed_records:
-        save_to_db(DB_PATH, processed_records)
-        export_to_markdown(processed_records, EXPORT_PATH)
+def run_profiled(func, profiler, output=None):
+    """Run func under cProfile or pyinstrument and print (or save) the report."""
+    if profiler == "pyinstrument":
+        from pyinstrument import Profiler
+        prof = Profiler()
+        prof.start()
+        try:
+            return func()
+        finally:
+            prof.stop()
+            if output:
+                with open(output, "w", encoding="utf-8") as f:
+                    f.write(prof.output_html())
+                print(f"Wrote pyinstrument report to {output}")
+            else:
+                print(prof.output_text(unicode=True, color=False))
+    import cProfile
+    import pstats
+    prof = cProfile.Profile()
+    try:
+        return prof.runcall(func)
+    finally:
+        if output:
+            prof.dump_stats(output)
+            print(f"Wrote cProfile stats to {output}")
+        pstats.Stats(prof).sort_stats("cumulative").print_stats(30)
 
-        # Aggregate all new summaries and summarize them in headline style
-        all_summaries = " ".join([rec["summary"] for rec in processed_records if rec.get("summary")])
-        summary_headline = ""
-        if all_summaries.strip():
-            print("Concatenated article summaries for headline:")
-            print(all_summaries)  # Debug print of concatenated summaries
-            print("Generating a headline for article summaries...")
-            prompt = (
-                "Write a simple headline for this text: " + all_summaries
-            )
-            agg_summary = summarizer(
-                prompt,
-                max_length=60,
-                min_length=10,
-                do_sample=False
-            )[0]['summary_text'].strip()
-            # Ensure the headline is at most 60 characters
-            if len(agg_summary) > 60:
-                agg_summary = agg_summary[:60]
-            # Trim back to the previous sentence stop if incomplete
-            import re
-            last_punct = max(agg_summary.rfind('.'), agg_summary.rfind('!'), agg_summary.rfind('?'))
-            if last_punct != -1 and last_punct < len(agg_summary) - 1:
-                agg_summary = agg_summary[:last_punct+1].strip()
-            summary_headline = agg_summary
-            print(f"Headline-style aggregate summary (<=60 chars): {summary_headline}")
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="newsletter", description="Build a newsletter from RSS feeds.")
+    parser.add_argument("--metrics", default=METRICS_PATH,
+                        help="Write per-stage timings and counters to this file (.json or .jsonl)")
+    parser.add_argument("--profile", nargs="?", const="cprofile", choices=["cprofile", "pyinstrument"],
+                        help="Profile the run with cProfile (default) or pyinstrument")
+    parser.add_argument("--profile-output", help="Save the profile (cProfile stats or pyinstrument HTML) to this file")
+    parser.add_argument("--headless", action="store_true",
+                        help="Select articles automatically with the AUTO_SELECT_* rules instead of the Tk picker")
+    parser.add_argument("--no-daemon", action="store_true", help="Run in this process even if a newsletter daemon is running")
+    subparsers = parser.add_subparsers(dest="command")
+    search = subparsers.add_parser("search", help="Search stored stories (FTS5 query syntax)")
+    search.add_argument("query", nargs="+", help='Words, "quoted phrases", prefix* or column:term filters')
+    search.add_argument("--limit", type=int, default=20, help="Maximum number of results")
+    export = subparsers.add_parser("export", help="Regenerate a past issue or a date-range digest from the database")
+    export.add_argument("--date", type=_parse_date, help="Issue date (YYYY-MM-DD); defaults to today")
+    export.add_argument("--from", dest="start", type=_parse_date, help="First issue date of a digest")
+    export.add_argument("--to", dest="end", type=_parse_date,
+                        help="Last issue date of a digest (default: today; without --from, exports just this day)")
+    export.add_argument("--format", dest="formats", nargs="+", choices=list(RENDERERS), default=EXPORT_FORMATS)
+    export.add_argument("--output", default=EXPORT_PATH, help="Directory to write to (default: EXPORT_PATH)")
+    args = parser.parse_args(argv)
+
+    if args.command == "search":
+        run_search(" ".join(args.query), args.limit)
+        return
+    if args.command == "export":
+        if args.date and (args.start or args.end):
+            parser.error("use either --date or --from/--to")
+        # --to alone exports that one day, like --date
+        start = args.date or args.start or args.end or datetime.date.today()
+        end = args.date or args.end or (datetime.date.today() if args.start else start)
+        if end < start:
+            parser.error(f"--to {end} is before --from {start}")
+        export_archive(DB_PATH, start, end, args.output, args.formats)
+        return
+
+    selector = get_selector("auto" if args.headless else None)
+    session = lambda: run_session(selector)
+    if not args.no_daemon and daemon_available():
+        session = lambda: run_client_session(selector)
+    metrics.reset()
+    try:
+        if args.profile:
+            run_profiled(session, args.profile, args.profile_output)
         else:
-            summary_headline = ""
-        # Pass the summary_headline to export_to_markdown
-        export_to_markdown(processed_records, EXPORT_PATH, summary_headline=summary_headline)
-    else:
-        print("No articles could be processed.")
+            session()
+    finally:
+        if args.metrics or args.profile:
+            metrics.report()
+        if args.metrics:
+            metrics.write_metrics(args.metrics)
 
 if __name__ == "__main__":
     print("Welcome to the Newsletter application!")
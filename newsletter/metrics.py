@@ -0,0 +1,117 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+# Process-wide timings and counters for the current run.  Spans record how
+# long each stage took; counters accumulate quantities such as bytes fetched.
+_lock = threading.Lock()
+_spans = []
+_counters = {}
+_run_started = time.time()
+
+def reset():
+    global _run_started
+    with _lock:
+        _spans.clear()
+        _counters.clear()
+        _run_started = time.time()
+
+@contextmanager
+def span(name, **attrs):
+    """Time the enclosed block as one occurrence of the stage ``name``."""
+    started = time.time()
+    t0 = time.perf_counter()
+    error = None
+    try:
+        yield attrs
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        record = {
+            "name": name,
+            "start": started,
+            "seconds": time.perf_counter() - t0,
+            "thread": threading.current_thread().name,
+        }
+        if attrs:
+            record["attrs"] = attrs
+        if error:
+            record["error"] = error
+        with _lock:
+            _spans.append(record)
+
+def incr(name, value=1):
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+def percentile(values, pct):
+    """Linearly interpolated pct-th percentile of values; 0.0 when empty."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * pct / 100.0
+    lo = int(k)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+def stage_stats(name=None):
+    """Return {stage: {count, total, mean, p50, p95, max}} for recorded spans."""
+    with _lock:
+        spans = list(_spans)
+    by_name = {}
+    for s in spans:
+        if name is None or s["name"] == name:
+            by_name.setdefault(s["name"], []).append(s["seconds"])
+    stats = {}
+    for stage, values in by_name.items():
+        values.sort()
+        stats[stage] = {
+            "count": len(values),
+            "total": sum(values),
+            "mean": sum(values) / len(values),
+            "p50": percentile(values, 50),
+            "p95": percentile(values, 95),
+            "max": values[-1],
+        }
+    return stats
+
+def snapshot():
+    with _lock:
+        counters = dict(_counters)
+    return {
+        "run_started": _run_started,
+        "wall_seconds": time.time() - _run_started,
+        "stages": stage_stats(),
+        "counters": counters,
+    }
+
+def report():
+    snap = snapshot()
+    print(f"Run metrics ({snap['wall_seconds']:.1f}s wall clock):")
+    print(f"  {'stage':<16}{'count':>7}{'total s':>10}{'p50 s':>9}{'p95 s':>9}{'max s':>9}")
+    for stage, st in sorted(snap["stages"].items(), key=lambda kv: -kv[1]["total"]):
+        print(f"  {stage:<16}{st['count']:>7}{st['total']:>10.2f}{st['p50']:>9.3f}{st['p95']:>9.3f}{st['max']:>9.3f}")
+    for name, value in sorted(snap["counters"].items()):
+        print(f"  {name}: {value}")
+
+def write_metrics(path):
+    """Write the run's metrics to ``path``.
+
+    A ``.jsonl`` path gets one line per span and counter followed by a
+    summary line; any other path gets a single JSON document.
+    """
+    snap = snapshot()
+    with _lock:
+        spans = list(_spans)
+    with open(path, "w", encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            for s in spans:
+                f.write(json.dumps(dict(s, type="span")) + "\n")
+            for name, value in snap["counters"].items():
+                f.write(json.dumps({"type": "counter", "name": name, "value": value}) + "\n")
+            f.write(json.dumps(dict(snap, type="summary")) + "\n")
+        else:
+            json.dump(dict(snap, spans=spans), f, indent=2)
+    print(f"Wrote metrics to {path}")
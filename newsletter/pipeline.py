@@ -0,0 +1,193 @@
+import threading
+import time
+from queue import Queue, Empty
+from newsletter import metrics
+from newsletter.db import save_to_db, get_story_summary, get_known_duplicates, save_duplicate
+from newsletter.dedupe import DuplicateDetector, NEAR_DUPLICATE_ACTION
+from newsletter.fetch import iter_pages
+from newsletter.scheduler import GenerationScheduler
+from newsletter.summarize import prepare_article, summarize_records, SUMMARY_BATCH_SIZE, SUMMARY_TIME_BUDGET_SECONDS
+
+# Sentinel passed down the queues when an upstream stage has finished
+_DONE = object()
+
+def _download_stage(selected, db_path, parse_q):
+    try:
+        by_url = {art['url']: art for art in selected}
+        for url, page in iter_pages(list(by_url), db_path=db_path):
+            parse_q.put((by_url[url], page))
+    finally:
+        parse_q.put(_DONE)
+
+def _check_duplicate(record, detector, action, db_path):
+    """Return False if record should be dropped as a near-duplicate.
+
+    With the "reuse" action a duplicate of a stored story takes over its
+    summary, and a duplicate of an article earlier in this run is marked
+    with ``duplicate_of`` so the summarizer copies the original's summary.
+    """
+    dup_url, similarity, where = detector.check(record)
+    if dup_url is None:
+        return True
+    metrics.incr("near_duplicates")
+    print(f"Near-duplicate of {dup_url} ({similarity:.0%} similar, {where}): {record['url']}")  # Debug print
+    if action == "skip":
+        # Remembered so later runs drop this URL (and its variants) before downloading it
+        save_duplicate(db_path, record["url"], dup_url, similarity)
+        return False
+    if where == "history":
+        record["summary"] = get_story_summary(db_path, dup_url)
+        if record["summary"] is None:
+            # The stored story has no summary to reuse, so summarize this one normally
+            return True
+    record["duplicate_of"] = dup_url
+    return True
+
+def _parse_stage(parse_q, summarize_q, loader, db_path, detector=None, duplicate_action=None, prepared=()):
+    tokenizer = None
+    try:
+        # Records prepared ahead of time still go through the duplicate check
+        for record in prepared:
+            if detector is not None and not _check_duplicate(record, detector, duplicate_action, db_path):
+                continue
+            summarize_q.put(record)
+        while True:
+            item = parse_q.get()
+            if item is _DONE:
+                return
+            art, page = item
+            print(f"Processing headline: {art['title']}")  # Print headline before URL
+            if page is None:
+                print(f"Failed to download: {art['url']}")  # Debug print
+                continue
+            if tokenizer is None:
+                # Downloads start before the model is ready; only parsing needs the tokenizer
+                _, tokenizer = loader.get()
+            try:
+                record = prepare_article(art, tokenizer, page=page, db_path=db_path)
+            except Exception as e:
+                print(f"Error processing {art['url']}: {e}")
+                continue
+            if record and detector is not None and not _check_duplicate(record, detector, duplicate_action, db_path):
+                continue
+            if record:
+                summarize_q.put(record)
+    finally:
+        summarize_q.put(_DONE)
+
+def run_pipeline(selected, loader, db_path, summary_max_words, batch_size=None, on_record=None, duplicate_action=None,
+                 prepared=None):
+    """Download, parse, summarize and store the selected articles as a stream.
+
+    Downloads feed a parse thread, which feeds the summarizer running on the
+    calling thread.  The summarizer takes whatever records are ready (up to
+    ``batch_size``) so one slow site never stalls the model, and each batch
+    is committed to the database as soon as it is summarized, after which
+    ``on_record`` (if given) is called for each record.  Returns the
+    processed records in selection order.
+
+    Near-duplicates (syndicated copies, within the run or of stored
+    stories) are skipped or reuse the original's summary according to
+    ``duplicate_action`` ("skip", "reuse" or "off"; NEAR_DUPLICATE_ACTION by
+    default).  Skipped URLs are recorded, and are dropped before download
+    when they come up again.
+
+    With SUMMARY_TIME_BUDGET_SECONDS set, a GenerationScheduler adapts
+    beams and summary lengths per batch so the run finishes within the
+    budget (counted from the start of the run); articles that still would
+    not fit are summarized extractively.
+
+    ``prepared`` maps URLs to records already downloaded and summarized
+    (see newsletter.speculate); those articles skip straight to storage.
+    """
+    if duplicate_action is None:
+        duplicate_action = NEAR_DUPLICATE_ACTION
+    if duplicate_action not in ("skip", "reuse", "off"):
+        raise ValueError(f"Unknown duplicate action: {duplicate_action!r} (expected 'skip', 'reuse' or 'off')")
+    detector = DuplicateDetector(db_path) if duplicate_action != "off" else None
+    if duplicate_action == "skip":
+        # Feed candidates are already filtered; URLs passed in directly (daemon jobs) are not
+        known = get_known_duplicates(db_path, [art['url'] for art in selected])
+        if known:
+            print(f"Skipping {len(known)} articles already found to be near-duplicates.")  # Debug print
+            metrics.incr("near_duplicates", len(known))
+            selected = [art for art in selected if art['url'] not in known]
+    if batch_size is None:
+        batch_size = SUMMARY_BATCH_SIZE
+    batch_size = max(1, int(batch_size))
+    scheduler = None
+    if SUMMARY_TIME_BUDGET_SECONDS:
+        scheduler = GenerationScheduler(time.monotonic() + SUMMARY_TIME_BUDGET_SECONDS, len(selected),
+                                        summary_max_words=summary_max_words)
+    prepared = prepared or {}
+    ahead = [prepared[art['url']] for art in selected if art['url'] in prepared]
+    to_download = [art for art in selected if art['url'] not in prepared]
+    parse_q = Queue()
+    summarize_q = Queue()
+    threads = [
+        threading.Thread(target=_download_stage, args=(to_download, db_path, parse_q), name="download", daemon=True),
+        threading.Thread(target=_parse_stage, args=(parse_q, summarize_q, loader, db_path, detector, duplicate_action, ahead), name="parse", daemon=True),
+    ]
+    for t in threads:
+        t.start()
+
+    summarizer, _ = loader.get()
+    # A worker pool can run several batches at once, so hand it more records per round
+    max_take = batch_size * getattr(summarizer, "num_workers", 1)
+    processed = []
+    # Summaries produced this run, and in-run duplicates waiting for their original
+    summaries = {}
+    waiting = {}
+
+    def _finish(records):
+        save_to_db(db_path, records)
+        processed.extend(records)
+        if on_record:
+            for rec in records:
+                on_record(rec)
+
+    done = False
+    while not done:
+        batch = [summarize_q.get()]
+        while len(batch) < max_take:
+            try:
+                batch.append(summarize_q.get_nowait())
+            except Empty:
+                break
+        if _DONE in batch:
+            done = True
+            batch = [rec for rec in batch if rec is not _DONE]
+        ready = []
+        for rec in batch:
+            original = rec.get("duplicate_of")
+            if original and rec.get("summary") is None:
+                if original not in summaries:
+                    waiting.setdefault(original, []).append(rec)
+                    continue
+                rec["summary"] = summaries[original]
+            ready.append(rec)
+        batch = ready
+        if not batch:
+            continue
+        summarize_records(batch, summarizer, summary_max_words, batch_size=batch_size, db_path=db_path, scheduler=scheduler)
+        for rec in list(batch):
+            summaries[rec["url"]] = rec["summary"]
+            for dup in waiting.pop(rec["url"], []):
+                dup["summary"] = rec["summary"]
+                batch.append(dup)
+        _finish(batch)
+    # Duplicates whose original was never summarized in this run get their own summary
+    leftover = [rec for recs in waiting.values() for rec in recs]
+    if leftover:
+        for rec in leftover:
+            rec.pop("duplicate_of", None)
+        summarize_records(leftover, summarizer, summary_max_words, batch_size=batch_size, db_path=db_path, scheduler=scheduler)
+        _finish(leftover)
+    for t in threads:
+        t.join()
+    if scheduler is not None:
+        scheduler.report()
+
+    order = {art['url']: i for i, art in enumerate(selected)}
+    processed.sort(key=lambda rec: order.get(rec['url'], len(order)))
+    return processed
@@ -1,41 +1,118 @@
 import feedparser
 import datetime
 import html
-from newsletter.db import get_existing_urls
+from concurrent.futures import ThreadPoolExecutor
+from newsletter.db import get_existing_urls, get_existing_canonical_urls, get_feed_states, save_feed_states
+from newsletter.dedupe import canonicalize_url
+import config
+from newsletter import metrics
 from config import MAX_ARTICLE_AGE_DAYS
 
+FEED_WORKERS = getattr(config, "FEED_WORKERS", 8)
+FEED_ONLY_NEW_ENTRIES = getattr(config, "FEED_ONLY_NEW_ENTRIES", True)
+
+def _entry_id(entry):
+    return entry.get("id") or entry.get("link")
+
+def _entry_record(entry):
+    """The parts of a feedparser entry that are kept, as a JSON-serializable dict."""
+    parsed = entry.get("published_parsed") or entry.get("updated_parsed")
+    published = datetime.datetime(*parsed[:6]).isoformat() if parsed else None
+    return {
+        "id": _entry_id(entry),
+        "link": entry.get("link"),
+        "title": entry.get("title", ""),
+        "published": published,
+    }
+
+def fetch_feed(rss_url, state=None):
+    """Fetch one feed with a conditional GET.
+
+    Returns (entries, new_state), with entries as _entry_record dicts.
+    With FEED_ONLY_NEW_ENTRIES, only entries newer than the last seen
+    entry ID are read from the feed; feeds are assumed to list newest
+    first.  Entries offered in earlier runs but never stored (kept in the
+    state as ``pending_entries``) are always returned again, including
+    when the feed is unchanged (HTTP 304) or cannot be fetched.
+    """
+    state = state or {}
+    pending = state.get("pending_entries") or []
+    feed = feedparser.parse(rss_url, etag=state.get("etag"), modified=state.get("modified"))
+    if feed.get("status") == 304:
+        print(f"Feed not modified: {rss_url} ({len(pending)} pending entries)")  # Debug print
+        metrics.incr("feeds_not_modified")
+        return list(pending), state
+    if feed.get("bozo") and not feed.entries:
+        print(f"Error fetching feed {rss_url}: {feed.get('bozo_exception')}")
+        return list(pending), state
+    entries = feed.entries
+    last_entry_id = state.get("last_entry_id")
+    if FEED_ONLY_NEW_ENTRIES and last_entry_id:
+        new_entries = []
+        for entry in entries:
+            if _entry_id(entry) == last_entry_id:
+                break
+            new_entries.append(entry)
+        entries = new_entries
+    entries = [_entry_record(entry) for entry in entries if entry.get("link")]
+    new_links = {entry["link"] for entry in entries}
+    replayed = [entry for entry in pending if entry["link"] not in new_links]
+    new_state = {
+        "etag": feed.get("etag"),
+        "modified": feed.get("modified"),
+        "last_entry_id": _entry_id(feed.entries[0]) if feed.entries else last_entry_id,
+        "pending_entries": pending,
+    }
+    print(f"Feed {rss_url}: {len(entries)} new entries, {len(replayed)} pending")  # Debug print
+    metrics.incr("feed_entries", len(entries))
+    return entries + replayed, new_state
+
 def fetch_instapaper_articles(rss_urls, db_path, max_articles):
     print("Fetching articles from RSS feed...")  # Debug print
     since = datetime.datetime.now() - datetime.timedelta(days=MAX_ARTICLE_AGE_DAYS)
     recent = []
-    existing_urls = get_existing_urls(db_path)
     if not isinstance(rss_urls, list):
         rss_urls = [rss_urls]
-    for rss_url in rss_urls:
-        feed = feedparser.parse(rss_url)
-        for entry in feed.entries:
-            pub_date = None
-            if hasattr(entry, "published_parsed") and entry.published_parsed:
-                pub_date = datetime.datetime.fromtimestamp(
-                    int(datetime.datetime(*entry.published_parsed[:6]).timestamp())
-                )
-            elif hasattr(entry, "updated_parsed") and entry.updated_parsed:
-                pub_date = datetime.datetime.fromtimestamp(
-                    int(datetime.datetime(*entry.updated_parsed[:6]).timestamp())
-                )
-            else:
-                pub_date = None
-            if entry.link in existing_urls:
+    with metrics.span("feed_fetch", feeds=len(rss_urls)):
+        states = get_feed_states(db_path, rss_urls)
+        # Fetch all feeds concurrently; feedparser is I/O bound here
+        with ThreadPoolExecutor(max_workers=max(1, min(FEED_WORKERS, len(rss_urls)))) as executor:
+            results = list(executor.map(lambda url: fetch_feed(url, states.get(url)), rss_urls))
+    with metrics.span("dedupe"):
+        # Indexed membership check for just this run's candidate links
+        links = [entry["link"] for entries, _ in results for entry in entries]
+        existing_urls = get_existing_urls(db_path, links)
+        # Tracking-parameter and AMP variants of stored or already-listed stories
+        canonical = {link: canonicalize_url(link) for link in links}
+        stored_canonical = get_existing_canonical_urls(db_path, canonical.values())
+        seen_canonical = set(stored_canonical)
+    new_states = {}
+    for url, (entries, state) in zip(rss_urls, results):
+        pending = []
+        for entry in entries:
+            pub_date = datetime.datetime.fromisoformat(entry["published"]) if entry["published"] else None
+            if entry["link"] in existing_urls:
+                continue
+            if canonical[entry["link"]] in stored_canonical:
+                metrics.incr("duplicate_urls")
+                continue
+            if not pub_date or pub_date < since:
+                continue
+            # Kept until the story is stored, so unpicked and unprocessed entries are offered again
+            pending.append(entry)
+            if canonical[entry["link"]] in seen_canonical:
+                metrics.incr("duplicate_urls")
                 continue
-            if pub_date and pub_date >= since:
-                decoded_title = html.unescape(entry.title)
-                recent.append({
-                    "title": decoded_title,
-                    "url": entry.link,
-                    "published": pub_date.strftime("%Y-%m-%d"),
-                    "pub_date_obj": pub_date,  # For sorting
-                })
-    # Sort all articles by pub_date_obj descending, then limit to max_articles
+            seen_canonical.add(canonical[entry["link"]])
+            recent.append({
+                "title": html.unescape(entry["title"]),
+                "url": entry["link"],
+                "published": pub_date.strftime("%Y-%m-%d"),
+                "pub_date_obj": pub_date,  # For sorting
+            })
+        new_states[url] = dict(state, pending_entries=pending)
+    save_feed_states(db_path, new_states)
+    # Sort all articles by pub_date_obj descending, then limit to max_articles (None keeps all)
     recent.sort(key=lambda x: x["pub_date_obj"], reverse=True)
     # Remove the helper field before returning
     for r in recent:
@@ -0,0 +1,121 @@
+import time
+from config import NUM_BEAMS, SUMMARY_MAX_WORDS
+from newsletter import metrics
+
+# Tokens per word for English BPE vocabularies, until articles have been measured
+DEFAULT_TOKENS_PER_WORD = 1.35
+# Generation seconds per output token per beam, until a batch has been measured
+DEFAULT_SECONDS_PER_TOKEN = 0.03
+# Summary lengths tried, as fractions of SUMMARY_MAX_WORDS, once beams are down to one
+LENGTH_FRACTIONS = (1.0, 0.75, 0.5)
+
+def generation_settings(num_beams=None, summary_max_words=None, tokens_per_word=None, length_fraction=1.0):
+    """Generation kwargs for a summary of about summary_max_words words, budgeted in tokens.
+
+    Beam search stops as soon as num_beams hypotheses are complete.  A
+    shortened summary gets a length penalty below 1 so beams that end on
+    their own, inside the tighter cap, win over ones cut off at the limit.
+    """
+    num_beams = NUM_BEAMS if num_beams is None else num_beams
+    summary_max_words = SUMMARY_MAX_WORDS if summary_max_words is None else summary_max_words
+    tokens_per_word = tokens_per_word or DEFAULT_TOKENS_PER_WORD
+    max_new_tokens = max(16, int(round(summary_max_words * length_fraction * tokens_per_word)))
+    return {
+        "num_beams": num_beams,
+        "max_new_tokens": max_new_tokens,
+        "min_new_tokens": max(8, max_new_tokens // 2),
+        "early_stopping": num_beams > 1,
+        "length_penalty": 1.0 if length_fraction >= 1.0 else 0.8,
+        "do_sample": False,
+    }
+
+class GenerationScheduler:
+    """Choose generation settings per batch so the whole run finishes by a deadline.
+
+    Each batch gets the remaining time in proportion to its share of the
+    articles still to be summarized.  Settings are tried from the
+    configured quality downwards: fewer beams first, then shorter
+    summaries.  A batch's cost is estimated as
+    sequences x max_new_tokens x num_beams x measured seconds per token,
+    assuming every sequence runs to its cap.  Articles that do not fit even
+    the cheapest settings are left for the extractive tier.
+    """
+
+    def __init__(self, deadline, total_articles, num_beams=None, summary_max_words=None):
+        self.deadline = deadline
+        self.started = time.monotonic()
+        self.remaining_articles = max(0, int(total_articles))
+        self.num_beams = NUM_BEAMS if num_beams is None else num_beams
+        self.summary_max_words = SUMMARY_MAX_WORDS if summary_max_words is None else summary_max_words
+        self.choices = {}
+        self.extractive = 0
+
+    def _ladder(self):
+        for beams in range(max(1, self.num_beams), 0, -1):
+            yield beams, LENGTH_FRACTIONS[0]
+        for fraction in LENGTH_FRACTIONS[1:]:
+            yield 1, fraction
+
+    def plan(self, sequences, tokens_per_word=None, seconds_per_token=None):
+        """Return (settings, n): generation kwargs for the first n of the pending articles.
+
+        ``sequences`` lists the model passes each pending article needs.
+        Articles after the first n should be summarized extractively;
+        settings is None when n is 0.  Until a latency has been measured,
+        at least one article is run with the cheapest settings as a probe.
+        """
+        measured = seconds_per_token is not None
+        seconds_per_token = seconds_per_token or DEFAULT_SECONDS_PER_TOKEN
+        count = len(sequences)
+        remaining = self.deadline - time.monotonic()
+        share = remaining * count / max(count, self.remaining_articles)
+        total = sum(sequences)
+        settings = None
+        for beams, fraction in self._ladder():
+            settings = generation_settings(beams, self.summary_max_words, tokens_per_word, fraction)
+            per_sequence = settings["max_new_tokens"] * beams * seconds_per_token
+            if total * per_sequence <= share:
+                self._log(settings, count, total * per_sequence, share)
+                return settings, count
+        # Even the cheapest settings overrun; give the model as many articles as fit
+        fit = 0
+        used = 0.0
+        for n in sequences:
+            if used + n * per_sequence > share:
+                break
+            used += n * per_sequence
+            fit += 1
+        if fit == 0 and not measured and remaining > 0:
+            fit = 1
+            used = sequences[0] * per_sequence
+        if fit == 0:
+            print(f"Scheduler: {share:.1f}s left for {count} articles; no generation settings fit")  # Debug print
+            return None, 0
+        self._log(settings, fit, used, share)
+        return settings, fit
+
+    def _log(self, settings, count, estimate, share):
+        key = (settings["num_beams"], settings["max_new_tokens"])
+        self.choices[key] = self.choices.get(key, 0) + count
+        if settings["num_beams"] < self.num_beams or settings["length_penalty"] != 1.0:
+            metrics.incr("scheduler_downgrades", count)
+        print(f"Scheduler: {count} articles with num_beams={settings['num_beams']}, "
+              f"max_new_tokens={settings['max_new_tokens']}, length_penalty={settings['length_penalty']} "
+              f"(estimated {estimate:.1f}s of {share:.1f}s available)")  # Debug print
+
+    def complete(self, count, extractive=0):
+        """Record that count articles are done, extractive of them without the model."""
+        self.remaining_articles = max(0, self.remaining_articles - count)
+        self.extractive += extractive
+
+    def report(self):
+        """Print the settings used and how close the run came to the deadline; returns the margin in seconds."""
+        margin = self.deadline - time.monotonic()
+        used = ", ".join(f"{n} x (beams={b}, max_new_tokens={t})" for (b, t), n in sorted(self.choices.items(), reverse=True))
+        print(f"Scheduler: generation settings used: {used or 'none'}; {self.extractive} articles extractive")
+        if margin >= 0:
+            print(f"Scheduler: finished {margin:.1f}s before the deadline "
+                  f"({time.monotonic() - self.started:.1f}s of {self.deadline - self.started:.1f}s used)")
+        else:
+            print(f"Scheduler: overran the deadline by {-margin:.1f}s")
+        return margin
@@ -0,0 +1,130 @@
+import datetime
+import re
+from urllib.parse import urlparse
+import config
+from config import MAX_ARTICLES_FOR_SELECTION
+
+SELECTION_MODE = getattr(config, "SELECTION_MODE", "gui")
+AUTO_SELECT_COUNT = getattr(config, "AUTO_SELECT_COUNT", 10)
+AUTO_SELECT_MAX_CANDIDATES = getattr(config, "AUTO_SELECT_MAX_CANDIDATES", None)
+AUTO_SELECT_DOMAIN_ALLOW = getattr(config, "AUTO_SELECT_DOMAIN_ALLOW", [])
+AUTO_SELECT_DOMAIN_DENY = getattr(config, "AUTO_SELECT_DOMAIN_DENY", [])
+AUTO_SELECT_KEYWORDS = getattr(config, "AUTO_SELECT_KEYWORDS", {})
+AUTO_SELECT_RECENCY_HALF_LIFE_DAYS = getattr(config, "AUTO_SELECT_RECENCY_HALF_LIFE_DAYS", 2.0)
+AUTO_SELECT_RECENCY_WEIGHT = getattr(config, "AUTO_SELECT_RECENCY_WEIGHT", 1.0)
+AUTO_SELECT_MAX_PER_SOURCE = getattr(config, "AUTO_SELECT_MAX_PER_SOURCE", 2)
+AUTO_SELECT_MIN_SCORE = getattr(config, "AUTO_SELECT_MIN_SCORE", None)
+
+def _domain(url):
+    host = urlparse(url).netloc.lower()
+    return host[4:] if host.startswith("www.") else host
+
+def _matches(domain, patterns):
+    # "example.com" matches example.com and any subdomain of it
+    return any(domain == p or domain.endswith("." + p) for p in patterns)
+
+class GuiSelector:
+    """Let the user pick articles in the Tk window."""
+
+    max_candidates = MAX_ARTICLES_FOR_SELECTION
+    # Selection waits on the user, leaving time to summarize candidates speculatively
+    interactive = True
+
+    def select(self, articles, preview=None):
+        from newsletter.ui import select_articles_gui
+        return select_articles_gui(articles, preview=preview)
+
+class RuleSelector:
+    """Pick articles without a display by scoring every candidate at once.
+
+    score = sum of keyword weights found in the title (as whole words)
+            + recency_weight * 0.5 ** (age_days / half_life_days)
+
+    Denied domains (and, if an allow list is set, domains not on it) are
+    excluded, at most ``max_per_source`` articles are taken per domain and
+    the top ``count`` by score are returned in score order.
+    """
+
+    max_candidates = AUTO_SELECT_MAX_CANDIDATES
+    interactive = False
+
+    def __init__(self, count=None, allow=None, deny=None, keywords=None, half_life_days=None,
+                 recency_weight=None, max_per_source=None, min_score=None):
+        self.count = AUTO_SELECT_COUNT if count is None else count
+        allow = AUTO_SELECT_DOMAIN_ALLOW if allow is None else allow
+        deny = AUTO_SELECT_DOMAIN_DENY if deny is None else deny
+        self.allow = [d.lower() for d in allow]
+        self.deny = [d.lower() for d in deny]
+        keywords = AUTO_SELECT_KEYWORDS if keywords is None else keywords
+        self.keywords = {k.lower(): float(w) for k, w in keywords.items()}
+        # Whole words only, so "ai" does not match "said"; lookarounds also work for keywords like "c++"
+        self.keyword_patterns = [
+            (re.compile(r"(?<!\w)" + re.escape(k) + r"(?!\w)"), w) for k, w in self.keywords.items()
+        ]
+        self.half_life_days = AUTO_SELECT_RECENCY_HALF_LIFE_DAYS if half_life_days is None else half_life_days
+        self.recency_weight = AUTO_SELECT_RECENCY_WEIGHT if recency_weight is None else recency_weight
+        self.max_per_source = AUTO_SELECT_MAX_PER_SOURCE if max_per_source is None else max_per_source
+        self.min_score = AUTO_SELECT_MIN_SCORE if min_score is None else min_score
+
+    def score(self, articles, today=None):
+        """Return (scores, allowed, domain_ids) arrays aligned with articles."""
+        import numpy as np
+        today = today or datetime.date.today()
+        n = len(articles)
+        # Domain rules are evaluated once per distinct domain, then broadcast
+        domains, domain_ids = np.unique([_domain(a["url"]) for a in articles], return_inverse=True)
+        domain_ok = np.array([
+            (not self.allow or _matches(d, self.allow)) and not _matches(d, self.deny)
+            for d in domains
+        ], dtype=bool)
+        allowed = domain_ok[domain_ids] if n else np.zeros(0, dtype=bool)
+
+        titles = [a["title"].lower() for a in articles]
+        scores = np.zeros(n, dtype=float)
+        for pattern, weight in self.keyword_patterns:
+            scores += weight * np.fromiter((pattern.search(t) is not None for t in titles), dtype=bool, count=n)
+
+        ages = np.array([self._age_days(a.get("published"), today) for a in articles], dtype=float)
+        if self.recency_weight and self.half_life_days:
+            scores += self.recency_weight * np.power(0.5, ages / float(self.half_life_days))
+        return scores, allowed, domain_ids
+
+    @staticmethod
+    def _age_days(published, today):
+        try:
+            return max(0, (today - datetime.datetime.strptime(published, "%Y-%m-%d").date()).days)
+        except (TypeError, ValueError):
+            return 0
+
+    def select(self, articles):
+        import numpy as np
+        if not articles:
+            return []
+        scores, allowed, domain_ids = self.score(articles)
+        order = np.argsort(-scores, kind="stable")
+        # Rank of each candidate within its domain, in score order, for the per-source cap
+        dom = domain_ids[order]
+        by_dom = np.argsort(dom, kind="stable")
+        dom_sorted = dom[by_dom]
+        starts = np.r_[0, np.flatnonzero(dom_sorted[1:] != dom_sorted[:-1]) + 1]
+        group_start = np.repeat(starts, np.diff(np.r_[starts, len(dom_sorted)]))
+        rank = np.empty(len(order), dtype=int)
+        rank[by_dom] = np.arange(len(order)) - group_start
+        keep = allowed[order]
+        if self.max_per_source:
+            keep &= rank < self.max_per_source
+        if self.min_score is not None:
+            keep &= scores[order] >= self.min_score
+        chosen = order[keep][:self.count]
+        selected = [articles[i] for i in chosen]
+        print(f"Auto-selected {len(selected)} of {len(articles)} articles.")  # Debug print
+        return selected
+
+def get_selector(mode=None):
+    """Return the selector for ``mode`` ("gui" or "auto"), defaulting to SELECTION_MODE."""
+    mode = mode or SELECTION_MODE
+    if mode == "gui":
+        return GuiSelector()
+    if mode == "auto":
+        return RuleSelector()
+    raise ValueError(f"Unknown selection mode: {mode!r} (expected 'gui' or 'auto')")
@@ -0,0 +1,135 @@
+import threading
+from collections import OrderedDict
+from queue import Queue, Empty
+import config
+from newsletter import metrics
+from newsletter.fetch import iter_pages
+from newsletter.summarize import prepare_article, summarize_records, SUMMARY_BATCH_SIZE
+
+SPECULATIVE_TOP_N = getattr(config, "SPECULATIVE_TOP_N", 0)
+SPECULATIVE_CACHE_SIZE = getattr(config, "SPECULATIVE_CACHE_SIZE", 50)
+SPECULATIVE_PREVIEW = getattr(config, "SPECULATIVE_PREVIEW", True)
+
+# Sentinel put on the page queue when the downloads have finished
+_DONE = object()
+
+class Speculator:
+    """Download and summarize the top candidates while the picker is open.
+
+    The first ``top_n`` candidates are downloaded on one thread and
+    prepared and summarized in batches on another, using the model that is
+    loading in the background anyway.  Finished records are kept in a cache
+    of at most ``cache_size`` entries, oldest evicted first, and ``preview``
+    returns a summary as soon as it is ready.
+
+    ``take`` stops the work and hands over the finished records for the
+    selected articles, ready for run_pipeline.  A batch already on the
+    model is allowed to finish, since the pipeline needs the same model;
+    everything not yet started is dropped.
+    """
+
+    def __init__(self, articles, loader, db_path, summary_max_words, top_n=None, cache_size=None, batch_size=None):
+        top_n = SPECULATIVE_TOP_N if top_n is None else top_n
+        self.articles = articles[:max(0, top_n)]
+        self.loader = loader
+        self.db_path = db_path
+        self.summary_max_words = summary_max_words
+        self.cache_size = max(1, SPECULATIVE_CACHE_SIZE if cache_size is None else cache_size)
+        self.batch_size = max(1, int(SUMMARY_BATCH_SIZE if batch_size is None else batch_size))
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+        # Held while the tokenizer or model is in use, so take() can wait for the batch in progress
+        self.busy = threading.Lock()
+        self.stopped = threading.Event()
+        self.page_q = Queue()
+        print(f"Speculatively summarizing the top {len(self.articles)} candidates in the background...")  # Debug print
+        self._threads = [
+            threading.Thread(target=self._download, name="speculative-download", daemon=True),
+            threading.Thread(target=self._work, name="speculative-summarize", daemon=True),
+        ]
+        for t in self._threads:
+            t.start()
+
+    def _download(self):
+        try:
+            by_url = {art['url']: art for art in self.articles}
+            pages = iter_pages(list(by_url), db_path=self.db_path)
+            try:
+                for url, page in pages:
+                    if self.stopped.is_set():
+                        break
+                    if page is not None:
+                        self.page_q.put((by_url[url], page))
+            finally:
+                # Closing the generator cancels the downloads that have not started
+                pages.close()
+        finally:
+            self.page_q.put(_DONE)
+
+    def _work(self):
+        done = False
+        while not done and not self.stopped.is_set():
+            batch = [self.page_q.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.page_q.get_nowait())
+                except Empty:
+                    break
+            if _DONE in batch:
+                done = True
+                batch = [item for item in batch if item is not _DONE]
+            if not batch:
+                continue
+            try:
+                summarizer, tokenizer = self.loader.get()
+            except Exception as e:
+                print(f"Speculative summarization stopped: {e}")
+                return
+            with self.busy:
+                if self.stopped.is_set():
+                    return
+                try:
+                    with metrics.span("speculative_batch", articles=len(batch)):
+                        records = [prepare_article(art, tokenizer, page=page, db_path=self.db_path) for art, page in batch]
+                        records = [rec for rec in records if rec]
+                        if records:
+                            summarize_records(records, summarizer, self.summary_max_words,
+                                              batch_size=self.batch_size, db_path=self.db_path)
+                except Exception as e:
+                    print(f"Speculative summarization failed: {e}")
+                    continue
+                self._store(records)
+
+    def _store(self, records):
+        with self.lock:
+            for rec in records:
+                self.cache[rec['url']] = rec
+                self.cache.move_to_end(rec['url'])
+                metrics.incr("speculative_summaries")
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+                metrics.incr("speculative_evictions")
+
+    def preview(self, url):
+        """Return the finished summary for url, or None if it is not ready."""
+        with self.lock:
+            rec = self.cache.get(url)
+        return rec.get("summary") if rec else None
+
+    def take(self, selected):
+        """Stop speculating and return {url: record} for the selected articles that are done."""
+        self.stopped.set()
+        if not selected:
+            return {}
+        if self.busy.locked():
+            print("Waiting for the speculative batch in progress...")  # Debug print
+        with self.busy, self.lock:
+            finished = dict(self.cache)
+            self.cache.clear()
+        wanted = {art['url'] for art in selected}
+        taken = {url: rec for url, rec in finished.items() if url in wanted}
+        metrics.incr("speculative_hits", len(taken))
+        metrics.incr("speculative_unused", len(finished) - len(taken))
+        print(f"Speculative summaries: {len(taken)}/{len(selected)} selected articles ready, "
+              f"{len(finished) - len(taken)} unused.")  # Debug print
+        return taken
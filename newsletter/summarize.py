@@ -1,13 +1,61 @@
-from transformers import pipeline, AutoTokenizer
-from newspaper import Article
-from newspaper.article import ArticleException
+# transformers, torch, newspaper and lxml are imported inside the functions
+# that need them so that importing this module (and a run with no new
+# articles) stays fast.
 import re
+import hashlib
 import sqlite3
 import os
-import requests
-from bs4 import BeautifulSoup
+import time
+import threading
+from newsletter.fetch import fetch_page, fetch_head_meta, parse_head_meta
+from newsletter.db import (
+    ensure_models_table_and_get_device,
+    save_device_to_models_table,
+    save_backend_to_models_table,
+    save_worker_layout_to_models_table,
+    get_cached_summary,
+    save_cached_summary,
+    save_cached_page,
+    save_page_extraction,
+    get_domain_name,
+    save_domain_name,
+)
+import config
+from newsletter import metrics
+from newsletter.extractive import extract_sentences
+from newsletter.scheduler import GenerationScheduler, generation_settings
 from config import SUMMARY_MAX_WORDS, NUM_BEAMS
 
+MODEL_NAME = getattr(config, "HUGGINGFACE_MODEL", "facebook/bart-large-cnn")
+SUMMARY_BATCH_SIZE = getattr(config, "SUMMARY_BATCH_SIZE", 4)
+INFERENCE_BACKENDS = ("torch", "torch-int8", "onnx")
+INFERENCE_BACKEND = getattr(config, "INFERENCE_BACKEND", "torch")
+ONNX_MODEL_DIR = getattr(config, "ONNX_MODEL_DIR", "onnx-model")
+SUMMARY_CACHE_MAX_BYTES = getattr(config, "SUMMARY_CACHE_MAX_BYTES", 50 * 1024 * 1024)
+MAX_INPUT_TOKENS = 1024
+# Part of every summary cache key; bump it when the same settings start producing different summaries
+# (2: length budgeted in max_new_tokens rather than word-based max_length)
+SUMMARY_CACHE_VERSION = 2
+SUMMARY_WORKERS = getattr(config, "SUMMARY_WORKERS", 0)
+SUMMARY_THREADS_PER_WORKER = getattr(config, "SUMMARY_THREADS_PER_WORKER", None)
+DOMAIN_NAME_TTL_DAYS = getattr(config, "DOMAIN_NAME_TTL_DAYS", 30)
+LONG_ARTICLE_MODE = getattr(config, "LONG_ARTICLE_MODE", False)
+LONG_ARTICLE_BUDGET_SECONDS = getattr(config, "LONG_ARTICLE_BUDGET_SECONDS", 30)
+# Assumed generation time per chunk until a batch has been measured
+DEFAULT_SECONDS_PER_CHUNK = 5.0
+SUMMARY_MODE = getattr(config, "SUMMARY_MODE", "abstractive")
+SUMMARY_TIME_BUDGET_SECONDS = getattr(config, "SUMMARY_TIME_BUDGET_SECONDS", None)
+EXTRACTIVE_PRECOMPRESS = getattr(config, "EXTRACTIVE_PRECOMPRESS", True)
+# Words of concatenated summaries kept for the headline prompt, well inside the model input
+HEADLINE_INPUT_WORDS = 400
+
+# Hit/miss counters for the persistent summary cache, reset per process
+CACHE_STATS = {"hits": 0, "misses": 0}
+# Running estimates of generation seconds per sequence and per output token
+# per beam, measured by _generate
+_seconds_per_sequence = None
+_seconds_per_token = None
+
 def detect_device():
     try:
         import torch
@@ -24,184 +72,494 @@ def detect_device():
         print("Torch not installed, defaulting to CPU (device=-1)")
         return -1
 
-def get_summarizer_and_tokenizer(device):
-    MODEL_NAME = "facebook/bart-large-cnn"
-    if device == "mps":
+def get_summarizer_and_tokenizer(device, backend=None):
+    """Build the summarization pipeline for the configured inference backend.
+
+    ``torch`` runs the stock model on ``device``; ``torch-int8`` applies
+    dynamic int8 quantization to the Linear layers and ``onnx`` runs an
+    exported ONNX Runtime model.  The last two are CPU-only.
+    """
+    from transformers import pipeline
+    if backend is None:
+        backend = INFERENCE_BACKEND
+    if backend not in INFERENCE_BACKENDS:
+        raise ValueError(f"Unknown inference backend: {backend!r} (expected one of {', '.join(INFERENCE_BACKENDS)})")
+    if backend != "torch" and device != -1:
+        print(f"Backend {backend} runs on CPU only; ignoring device {device}")
+    if backend == "torch-int8":
+        import torch
+        from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
+        model = AutoModelForSeq2SeqLM.from_pretrained(MODEL_NAME)
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
+        summarizer = pipeline("summarization", model=model, tokenizer=tokenizer, device=-1)
+    elif backend == "onnx":
+        from transformers import AutoTokenizer
+        from optimum.onnxruntime import ORTModelForSeq2SeqLM
+        from optimum.pipelines import pipeline as ort_pipeline
+        if os.path.isdir(ONNX_MODEL_DIR):
+            model = ORTModelForSeq2SeqLM.from_pretrained(ONNX_MODEL_DIR)
+            tokenizer = AutoTokenizer.from_pretrained(ONNX_MODEL_DIR)
+        else:
+            print(f"Exporting {MODEL_NAME} to ONNX in {ONNX_MODEL_DIR}...")  # Debug print
+            model = ORTModelForSeq2SeqLM.from_pretrained(MODEL_NAME, export=True)
+            tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
+            model.save_pretrained(ONNX_MODEL_DIR)
+            tokenizer.save_pretrained(ONNX_MODEL_DIR)
+        summarizer = ort_pipeline("summarization", model=model, tokenizer=tokenizer, accelerator="ort")
+    elif device == "mps":
         summarizer = pipeline("summarization", model=MODEL_NAME, device_map={"": "mps"})
     else:
         summarizer = pipeline("summarization", model=MODEL_NAME, device=device)
-    tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
+    # The pipeline already owns a tokenizer; share it instead of loading a second one
+    tokenizer = summarizer.tokenizer
     return summarizer, tokenizer
 
-def extract_source_name(url):
+def resolve_device(db_path):
+    # Device/model selection logic
+    device = ensure_models_table_and_get_device(db_path)
+    if device is None:
+        device = detect_device()
+        save_device_to_models_table(db_path, device)
+    save_backend_to_models_table(db_path, INFERENCE_BACKEND)
+    if SUMMARY_WORKERS > 0:
+        from newsletter.workers import plan_worker_layout
+        save_worker_layout_to_models_table(db_path, plan_worker_layout())
+    return device
+
+class SummarizerLoader:
+    """Load the summarizer on a background thread.
+
+    ``resolve_device`` is called on the loader thread so that device
+    detection (which imports torch) is also kept off the startup path.
+    Call ``get()`` to block until the model is ready.
+    """
+
+    def __init__(self, resolve_device):
+        self._resolve_device = resolve_device
+        self._result = None
+        self._error = None
+        self.load_seconds = None
+        self._thread = threading.Thread(target=self._load, name="summarizer-loader", daemon=True)
+        self._thread.start()
+
+    def _load(self):
+        started = time.perf_counter()
+        try:
+            device = self._resolve_device()
+            if SUMMARY_WORKERS > 0:
+                from newsletter.workers import SummarizerPool
+                pool = SummarizerPool(device, INFERENCE_BACKEND)
+                self._result = (pool, pool.tokenizer)
+            else:
+                self._result = get_summarizer_and_tokenizer(device)
+        except Exception as e:
+            self._error = e
+        self.load_seconds = time.perf_counter() - started
+        print(f"Summarizer loaded in background in {self.load_seconds:.1f}s")  # Debug print
+
+    def ready(self):
+        return not self._thread.is_alive()
+
+    def get(self):
+        if self._thread.is_alive():
+            print("Waiting for summarizer to finish loading...")  # Debug print
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+def extract_source_name(url, html=None, db_path=None):
+    """Return the publication name for url.
+
+    A site-wide name (og:site_name, else twitter:site) is cached per host in
+    the domains table for DOMAIN_NAME_TTL_DAYS, so later articles from a
+    known host need no parsing and no request.  Otherwise only the page
+    head is parsed, from ``html`` if given or streamed up to </head>, with
+    <title> and then the host name as fallbacks.
+    """
+    from urllib.parse import urlparse
+    netloc = urlparse(url).netloc
+    host = netloc.lower()
     try:
-        # Use stealth headers to appear as a real browser
-        headers = {
-            "User-Agent": (
-                "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-                "AppleWebKit/537.36 (KHTML, like Gecko) "
-                "Chrome/120.0.0.0 Safari/537.36"
-            ),
-            "Accept-Language": "en-US,en;q=0.9",
-            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
-            "Connection": "keep-alive",
-            "DNT": "1",
-            "Upgrade-Insecure-Requests": "1",
-        }
-        resp = requests.get(url, headers=headers, timeout=10)
-        soup = BeautifulSoup(resp.text, "html.parser")
-        # Try Open Graph site name
-        og_site = soup.find("meta", property="og:site_name")
-        if og_site and og_site.get("content"):
-            return og_site["content"].strip()
-        # Try Twitter site
-        twitter_site = soup.find("meta", attrs={"name": "twitter:site"})
-        if twitter_site and twitter_site.get("content"):
-            return twitter_site["content"].strip().lstrip('@')
-        # Try <title>
-        if soup.title and soup.title.string:
-            return soup.title.string.strip()
-        # Fallback to domain
-        from urllib.parse import urlparse
-        return urlparse(url).netloc
+        if db_path:
+            cached = get_domain_name(db_path, host, DOMAIN_NAME_TTL_DAYS * 86400)
+            if cached:
+                metrics.incr("domain_cache_hits")
+                return cached
+        with metrics.span("source_name"):
+            found = parse_head_meta(html) if html is not None else fetch_head_meta(url, db_path=db_path)
+        if not found:
+            return netloc
+        site_name = found.get("og:site_name") or found.get("twitter:site", "").lstrip('@')
+        if site_name:
+            if db_path:
+                save_domain_name(db_path, host, site_name)
+            return site_name
+        # A page title is per article, so it is never cached for the domain
+        return found.get("title") or netloc
     except Exception as e:
         print(f"Error extracting source name: {e}")
-        from urllib.parse import urlparse
-        return urlparse(url).netloc
+        return netloc
 
-def process_article(article_info, summarizer, tokenizer, summary_max_words, num_beams=None):
-    from config import NUM_BEAMS
-    if num_beams is None:
-        num_beams = NUM_BEAMS
+def trim_summary(summary, summary_max_words):
+    summary_words = summary.split()
+    if len(summary_words) > summary_max_words:
+        sentences = re.split(r'(?<=[.!?])\s+', summary)
+        final_summary = []
+        word_count = 0
+        for sentence in sentences:
+            sentence_words = sentence.split()
+            final_summary.append(sentence)
+            word_count += len(sentence_words)
+            if word_count >= summary_max_words:
+                break
+        summary = " ".join(final_summary).strip()
+    sentences = re.split(r'(?<=[.!?])\s+', summary)
+    while sentences and not re.search(r'[.!?]$', sentences[-1]):
+        sentences.pop()
+    return " ".join(sentences).strip()
+
+def summary_cache_key(text, model_name, num_beams, summary_max_words, mode="truncate"):
+    """Content-address a summary by its input text and generation settings."""
+    h = hashlib.sha256()
+    for part in (f"v{SUMMARY_CACHE_VERSION}", model_name, str(num_beams), str(summary_max_words), mode, text):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+def prepare_article(article_info, tokenizer, page=None, db_path=None):
+    from newspaper import Article
+    from newspaper.article import ArticleException
     print(f"Processing article: {article_info['url']}")  # Debug print
+    # Download once and share the HTML between source naming and newspaper
+    if page is None:
+        page = fetch_page(article_info['url'], db_path=db_path)
+        if page is not None and db_path:
+            save_cached_page(db_path, page)
+    if page is None or page.get("html") is None:
+        print("Failed to process article.")  # Debug print
+        return None
     # Extract source/publication name before processing
-    publication_name = extract_source_name(article_info['url'])
+    publication_name = extract_source_name(article_info['url'], html=page["html"], db_path=db_path)
     print(f"Extracted source: {publication_name}")  # Debug print
-    article = Article(article_info['url'])
-    try:
-        article.download()
-        article.parse()
+    if page.get("not_modified") and page.get("text") is not None:
+        # Unchanged since the last fetch; reuse the stored extraction
+        print("Page not modified, reusing cached extraction.")  # Debug print
+        text = page["text"]
+        authors = page.get("authors") or []
+    else:
+        article = Article(article_info['url'])
+        try:
+            with metrics.span("extraction"):
+                article.download(input_html=page["html"])
+                article.parse()
+        except ArticleException:
+            print("Failed to process article.")  # Debug print
+            metrics.incr("extraction_errors")
+            return None
         text = article.text or ""
-        inputs = tokenizer(
-            text,
-            max_length=1024,
-            truncation=True,
-            return_tensors="pt",
-            add_special_tokens=True
-        )
-        input_ids = inputs["input_ids"][0]
-        truncated_text = tokenizer.decode(input_ids, skip_special_tokens=True)
-        if len(truncated_text.split()) < 30:
-            summary = truncated_text.strip()
+        authors = article.authors or []
+        if db_path:
+            save_page_extraction(db_path, article_info['url'], text, authors)
+    # Keep the full token ids; truncation or chunking happens at summarization time
+    with metrics.span("tokenization"):
+        input_ids = tokenizer(text, add_special_tokens=False, truncation=False)["input_ids"]
+    metrics.incr("tokens_in", len(input_ids))
+    return {
+        "headline": article_info['title'].replace('\n', ' ').replace('\r', ' '),
+        "body": text,
+        "author": ", ".join(authors),
+        "publication_date": article_info.get('published', ''),
+        "publication_name": publication_name,
+        "source": publication_name,
+        "summary": None,
+        "url": article_info['url'],
+        "input_ids": input_ids,
+        "token_count": len(input_ids),
+    }
+
+def _model_input_limit(tokenizer):
+    """Number of content tokens that fit in one model input, after special tokens."""
+    return MAX_INPUT_TOKENS - tokenizer.num_special_tokens_to_add(pair=False)
+
+def chunk_token_ids(input_ids, tokenizer, max_tokens):
+    """Split token ids into chunks of at most max_tokens, cutting after sentence-ending tokens.
+
+    A chunk is only cut mid-sentence when a single sentence is longer than
+    max_tokens.
+    """
+    boundary_ids = set()
+    for token_id in set(input_ids):
+        token = tokenizer.convert_ids_to_tokens(token_id)
+        if token and token.rstrip().endswith((".", "!", "?")):
+            boundary_ids.add(token_id)
+    chunks = []
+    start = 0
+    while start < len(input_ids):
+        end = min(start + max_tokens, len(input_ids))
+        if end < len(input_ids):
+            cut = end
+            while cut > start and input_ids[cut - 1] not in boundary_ids:
+                cut -= 1
+            if cut > start:
+                end = cut
+        chunks.append(input_ids[start:end])
+        start = end
+    return chunks
+
+def generate_batch(summarizer, id_lists, gen_kwargs):
+    """Pad one batch of token id lists and run model.generate on it.
+
+    Returns the generated token ids per input with special and padding
+    tokens removed.
+    """
+    tokenizer = summarizer.tokenizer
+    model = summarizer.model
+    special_ids = set(tokenizer.all_special_ids)
+    batch = tokenizer.pad(
+        {"input_ids": [tokenizer.build_inputs_with_special_tokens(ids) for ids in id_lists]},
+        return_tensors="pt",
+    ).to(model.device)
+    with metrics.span("generation", sequences=len(id_lists), input_tokens=int(batch["input_ids"].shape[1])):
+        generated = model.generate(**batch, **gen_kwargs)
+    return [[t for t in ids if t not in special_ids] for ids in generated.tolist()]
+
+def _generate(summarizer, id_lists, gen_kwargs, batch_size):
+    """Run model.generate directly on token ids in length-sorted batches.
+
+    Returns the generated token ids for each input, in input order.  A
+    worker pool (see newsletter.workers) receives all batches at once and
+    runs them in parallel.  Updates the running seconds per sequence and
+    per token estimates used for latency budgeting and scheduling.
+    """
+    global _seconds_per_sequence, _seconds_per_token
+    results = [None] * len(id_lists)
+    if not id_lists:
+        return results
+    order = sorted(range(len(id_lists)), key=lambda i: len(id_lists[i]), reverse=True)
+    batches = [order[i:i + batch_size] for i in range(0, len(order), batch_size)]
+    started = time.perf_counter()
+    if hasattr(summarizer, "generate_batches"):
+        outputs = summarizer.generate_batches([[id_lists[j] for j in indices] for indices in batches], gen_kwargs)
+    else:
+        outputs = [generate_batch(summarizer, [id_lists[j] for j in indices], gen_kwargs) for indices in batches]
+    elapsed = time.perf_counter() - started
+    per_sequence = elapsed / len(id_lists)
+    if _seconds_per_sequence is None:
+        _seconds_per_sequence = per_sequence
+    else:
+        _seconds_per_sequence = 0.7 * _seconds_per_sequence + 0.3 * per_sequence
+    tokens_out = 0
+    for indices, batch_output in zip(batches, outputs):
+        for j, ids in zip(indices, batch_output):
+            results[j] = ids
+            tokens_out += len(ids)
+    metrics.incr("tokens_out", tokens_out)
+    if tokens_out:
+        per_token = elapsed / (tokens_out * gen_kwargs.get("num_beams", 1))
+        _seconds_per_token = per_token if _seconds_per_token is None else 0.7 * _seconds_per_token + 0.3 * per_token
+    return results
+
+def _max_chunks_for_budget():
+    seconds = _seconds_per_sequence if _seconds_per_sequence is not None else DEFAULT_SECONDS_PER_CHUNK
+    # One extra sequence is spent on the reduce pass
+    return max(1, int(LONG_ARTICLE_BUDGET_SECONDS / max(seconds, 1e-6)) - 1)
+
+def summarize_extractive(rec, summary_max_words, reason="configured"):
+    """Fill in rec's summary with its most central sentences."""
+    rec["summary"] = extract_sentences(rec["body"], summary_max_words) or rec["body"].strip()
+    metrics.incr("extractive_summaries")
+    metrics.incr(f"extractive_{reason}")
+
+def _compress_ids(rec, tokenizer, limit):
+    """Token ids of an extractive digest of rec's body that fits the model input."""
+    words = len(rec["body"].split())
+    tokens_per_word = len(rec["input_ids"]) / max(1, words)
+    # Leave some slack: the digest's token/word ratio differs from the whole article's
+    budget = max(1, int(0.9 * limit / max(tokens_per_word, 1e-6)))
+    digest = extract_sentences(rec["body"], budget)
+    metrics.incr("precompressed_articles")
+    return tokenizer(digest, add_special_tokens=False, truncation=False)["input_ids"][:limit]
+
+def _sequences_needed(rec, limit, long_article_mode):
+    if long_article_mode and len(rec["input_ids"]) > limit:
+        # Map chunks plus one reduce pass
+        return min(-(-len(rec["input_ids"]) // limit), _max_chunks_for_budget()) + 1
+    return 1
+
+def summarize_records(records, summarizer, summary_max_words, num_beams=None, batch_size=None, db_path=None,
+                      long_article_mode=None, summary_mode=None, deadline=None, scheduler=None):
+    """Fill in ``summary`` for prepared records that lack one, from the cache, the model or extractively.
+
+    ``deadline`` is a time.monotonic() value.  Returns articles/sec for the model-backed records.
+    """
+    if num_beams is None:
+        num_beams = NUM_BEAMS
+    if batch_size is None:
+        batch_size = SUMMARY_BATCH_SIZE
+    if long_article_mode is None:
+        long_article_mode = LONG_ARTICLE_MODE
+    if summary_mode is None:
+        summary_mode = SUMMARY_MODE
+    if scheduler is None and deadline is not None:
+        scheduler = GenerationScheduler(deadline, len(records), num_beams, summary_max_words)
+    batch_size = max(1, int(batch_size))
+    if long_article_mode:
+        mode = "chunked"
+    else:
+        mode = "compressed" if EXTRACTIVE_PRECOMPRESS else "truncate"
+    tokenizer = summarizer.tokenizer
+    limit = _model_input_limit(tokenizer)
+    pending = []
+    for rec in records:
+        if rec.get("summary") is not None:
+            continue
+        if len(rec["body"].split()) < 30:
+            rec["summary"] = rec["body"].strip()
+            continue
+        if summary_mode == "extractive":
+            summarize_extractive(rec, summary_max_words)
+            continue
+        if db_path:
+            # Articles that fit the model input are summarized the same way in either mode
+            key_mode = "truncate" if mode == "compressed" and len(rec["input_ids"]) <= limit else mode
+            rec["cache_key"] = summary_cache_key(rec["body"], f"{MODEL_NAME}:{INFERENCE_BACKEND}", num_beams, summary_max_words, key_mode)
+            cached = get_cached_summary(db_path, rec["cache_key"])
+            if cached is not None:
+                CACHE_STATS["hits"] += 1
+                metrics.incr("summary_cache_hits")
+                rec["summary"] = cached
+                continue
+            CACHE_STATS["misses"] += 1
+            metrics.incr("summary_cache_misses")
+        pending.append(rec)
+    if db_path:
+        print(f"Summary cache: {CACHE_STATS['hits']} hits, {CACHE_STATS['misses']} misses")  # Debug print
+    if not pending:
+        if scheduler is not None:
+            scheduler.complete(len(records))
+        return 0.0
+    words = sum(len(rec["body"].split()) for rec in pending)
+    tokens_per_word = sum(len(rec["input_ids"]) for rec in pending) / max(1, words)
+    if scheduler is not None:
+        sequences = [_sequences_needed(rec, limit, long_article_mode) for rec in pending]
+        gen_kwargs, fit = scheduler.plan(sequences, tokens_per_word, _seconds_per_token)
+        overflow = pending[fit:]
+        pending = pending[:fit]
+        if overflow:
+            print(f"Time budget: {len(overflow)} articles summarized extractively")  # Debug print
+            for rec in overflow:
+                summarize_extractive(rec, summary_max_words, reason="budget")
+        scheduler.complete(len(records), extractive=len(overflow))
+        if not pending:
+            return 0.0
+    else:
+        gen_kwargs = generation_settings(num_beams, summary_max_words, tokens_per_word)
+    # Cache keys name the configured settings; summaries made with fewer beams or a shorter budget are not cached
+    cacheable = gen_kwargs == generation_settings(num_beams, summary_max_words, tokens_per_word)
+    print(f"Summarizing {len(pending)} articles in batches of {batch_size}...")  # Debug print
+    started = time.perf_counter()
+
+    try:
+        grouped = _summarize_abstractive(pending, summarizer, tokenizer, limit, gen_kwargs, batch_size, long_article_mode)
+    except Exception as e:
+        print(f"Summarization model failed ({type(e).__name__}: {e}); falling back to extractive summaries")
+        metrics.incr("model_failures")
+        for rec in pending:
+            summarize_extractive(rec, summary_max_words, reason="fallback")
+        return 0.0
+
+    for rec in pending:
+        summary_text = tokenizer.decode(grouped[id(rec)][0], skip_special_tokens=True).strip()
+        rec["summary"] = trim_summary(summary_text, summary_max_words)
+        # Words generated and then thrown away; the token budget should keep this near zero
+        metrics.incr("trimmed_words", len(summary_text.split()) - len(rec["summary"].split()))
+        if db_path and cacheable:
+            save_cached_summary(db_path, rec["cache_key"], rec["summary"], SUMMARY_CACHE_MAX_BYTES)
+    elapsed = time.perf_counter() - started
+    rate = len(pending) / elapsed if elapsed > 0 else 0.0
+    print(f"Summarized {len(pending)} articles in {elapsed:.1f}s ({rate:.2f} articles/sec, batch size {batch_size})")
+    return rate
+
+def _summarize_abstractive(pending, summarizer, tokenizer, limit, gen_kwargs, batch_size, long_article_mode):
+    """Run the map and reduce passes; returns {id(rec): [summary token ids]}."""
+    # Map: every short article and every chunk of every long article in one batched pass
+    sequences = []
+    owners = []
+    for rec in pending:
+        ids = rec["input_ids"]
+        if long_article_mode and len(ids) > limit:
+            chunks = chunk_token_ids(ids, tokenizer, limit)
+            max_chunks = _max_chunks_for_budget()
+            if len(chunks) > max_chunks:
+                print(f"Long article ({len(chunks)} chunks) limited to {max_chunks} chunks by latency budget")  # Debug print
+                chunks = chunks[:max_chunks]
+        elif len(ids) > limit and EXTRACTIVE_PRECOMPRESS:
+            chunks = [_compress_ids(rec, tokenizer, limit)]
         else:
-            summary_outputs = summarizer(
-                truncated_text,
-                max_length=summary_max_words,
-                min_length=max(20, summary_max_words // 2),
-                do_sample=False,
-                num_beams=num_beams
-            )
-            summary = summary_outputs[0]['summary_text'].strip()
-            summary_words = summary.split()
-            if len(summary_words) > summary_max_words:
-                sentences = re.split(r'(?<=[.!?])\s+', summary)
-                final_summary = []
-                word_count = 0
-                for sentence in sentences:
-                    sentence_words = sentence.split()
-                    final_summary.append(sentence)
-                    word_count += len(sentence_words)
-                    if word_count >= summary_max_words:
-                        break
-                summary = " ".join(final_summary).strip()
-            sentences = re.split(r'(?<=[.!?])\s+', summary)
-            while sentences and not re.search(r'[.!?]$', sentences[-1]):
-                sentences.pop()
-            summary = " ".join(sentences).strip()
-        print("Article processed successfully.")  # Debug print
-
-        return {
-            "headline": article_info['title'].replace('\n', ' ').replace('\r', ' '),
-            "body": text,
-            "author": ", ".join(article.authors) if article.authors else "",
-            "publication_date": article_info.get('published', ''),
-            "publication_name": publication_name,
-            "source": publication_name,
-            "summary": summary,
-            "url": article_info['url']
-        }
-    except ArticleException:
-        print("Failed to process article.")  # Debug print
+            chunks = [ids[:limit]]
+        for chunk in chunks:
+            sequences.append(chunk)
+            owners.append(rec)
+    outputs = _generate(summarizer, sequences, gen_kwargs, batch_size)
+    grouped = {}
+    for rec, output in zip(owners, outputs):
+        grouped.setdefault(id(rec), []).append(output)
+
+    # Reduce: summarize the concatenated chunk summaries of long articles, still as ids
+    reduce_recs = [rec for rec in pending if len(grouped[id(rec)]) > 1]
+    if reduce_recs:
+        print(f"Combining chunk summaries for {len(reduce_recs)} long articles...")  # Debug print
+        combined = [[t for out in grouped[id(rec)] for t in out][:limit] for rec in reduce_recs]
+        for rec, output in zip(reduce_recs, _generate(summarizer, combined, gen_kwargs, batch_size)):
+            grouped[id(rec)] = [output]
+    return grouped
+
+def process_article(article_info, summarizer, tokenizer, summary_max_words, num_beams=None, db_path=None):
+    record = prepare_article(article_info, tokenizer, db_path=db_path)
+    if record is None:
         return None
+    summarize_records([record], summarizer, summary_max_words, num_beams=num_beams, batch_size=1, db_path=db_path)
+    print("Article processed successfully.")  # Debug print
+    return record
+
+def generate_summary_headline(summarizer, records):
+    # Aggregate all new summaries and summarize them in headline style
+    all_summaries = " ".join([rec["summary"] for rec in records if rec.get("summary")])
+    if not all_summaries.strip():
+        return ""
+    # Many summaries can overflow the model input; keep the most central sentences
+    all_summaries = extract_sentences(all_summaries, HEADLINE_INPUT_WORDS)
+    print("Concatenated article summaries for headline:")
+    print(all_summaries)  # Debug print of concatenated summaries
+    print("Generating a headline for article summaries...")
+    prompt = (
+        "Write a simple headline for this text: " + all_summaries
+    )
+    try:
+        agg_summary = summarizer(
+            prompt,
+            max_length=60,
+            min_length=10,
+            do_sample=False,
+            truncation=True,
+        )[0]['summary_text'].strip()
+    except Exception as e:
+        print(f"Headline generation failed ({type(e).__name__}: {e}); using the most central sentence")
+        metrics.incr("model_failures")
+        agg_summary = extract_sentences(all_summaries, 12)
+    # Ensure the headline is at most 60 characters
+    if len(agg_summary) > 60:
+        agg_summary = agg_summary[:60]
+    # Trim back to the previous sentence stop if incomplete
+    last_punct = max(agg_summary.rfind('.'), agg_summary.rfind('!'), agg_summary.rfind('?'))
+    if last_punct != -1 and last_punct < len(agg_summary) - 1:
+        agg_summary = agg_summary[:last_punct+1].strip()
+    print(f"Headline-style aggregate summary (<=60 chars): {agg_summary}")
+    return agg_summary
 
 def export_to_markdown(records, export_path, summary_headline=""):
-    print("Exporting records to markdown...")  # Debug print
-    import datetime
-    from config import NEWSLETTER_HEADLINE, APPEND_DATE_TO_HEADLINE, INCLUDE_DISCLAIMER, DISCLAIMER_TEXT
-    date_str = datetime.datetime.now().strftime("%Y%m%d")
-    headline_date = datetime.datetime.now().strftime("%A %B %d")
-    filename = os.path.join(export_path, f"newsletter_{date_str}.md")
-    with open(filename, "w", encoding="utf-8") as f:
-        # Compose the top headline with the summary headline if present
-        top_headline = NEWSLETTER_HEADLINE
-        if summary_headline:
-            top_headline = f"{NEWSLETTER_HEADLINE} {summary_headline}"
-        if APPEND_DATE_TO_HEADLINE:
-            f.write(f"# {top_headline} {headline_date}\n\n")
-        else:
-            f.write(f"# {top_headline}\n\n")
-        for idx, rec in enumerate(records):
-            headline = rec['headline'].replace('\n', ' ').replace('\r', ' ')
-            headline = headline.replace('[', '\\[').replace(']', '\\]')
-            print(f"Markdown headline: {headline}")  # Debug print to check truncation
-            # Headline as a link, then two spaces and newline
-            f.write(f"[{headline}]({rec['url']})  \n")
-            # Source, hyphen, pubdate (mm/dd/yy), then two spaces and newline
-            pubdate = rec['publication_date']
-            try:
-                pubdate_fmt = datetime.datetime.strptime(pubdate, "%Y-%m-%d").strftime("%m/%d/%y")
-            except Exception:
-                pubdate_fmt = pubdate
-            f.write(f"{rec['source']} - {pubdate_fmt}  \n")
-            # Summary, then newline
-            f.write(f"{rec['summary']}\n")
-            # Add an additional newline before the section separator
-            f.write("\n---\n\n")
-        # Add disclaimer at the bottom if configured
-        if INCLUDE_DISCLAIMER and DISCLAIMER_TEXT:
-            f.write(f"{DISCLAIMER_TEXT}\n")
-    print(f"Exported to {filename}")
-import feedparser
-import datetime
-import html
-from newsletter.db import get_existing_urls
-
-def fetch_instapaper_articles(rss_url, db_path, max_articles):
-    print("Fetching articles from Instapaper RSS feed...")  # Debug print
-    feed = feedparser.parse(rss_url)
-    since = datetime.datetime.now() - datetime.timedelta(days=7)
-    recent = []
-    existing_urls = get_existing_urls(db_path)
-    for entry in feed.entries:
-        pub_date = None
-        if hasattr(entry, "published_parsed") and entry.published_parsed:
-            pub_date = datetime.datetime.fromtimestamp(
-                int(datetime.datetime(*entry.published_parsed[:6]).timestamp())
-            )
-        elif hasattr(entry, "updated_parsed") and entry.updated_parsed:
-            pub_date = datetime.datetime.fromtimestamp(
-                int(datetime.datetime(*entry.updated_parsed[:6]).timestamp())
-            )
-        else:
-            pub_date = None
-        if entry.link in existing_urls:
-            continue
-        if pub_date and pub_date >= since:
-            decoded_title = html.unescape(entry.title)
-            recent.append({
-                "title": decoded_title,
-                "url": entry.link,
-                "published": pub_date.strftime("%Y-%m-%d"),
-            })
-    print(f"Fetched {len(recent[:max_articles])} articles for selection.")  # Debug print
-    return recent[:max_articles]
+    """Write the Markdown issue for records; see newsletter.export for the other formats."""
+    from newsletter.export import export_issue
+    return export_issue(records, export_path, ["markdown"], summary_headline=summary_headline)[0]
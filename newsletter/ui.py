@@ -2,7 +2,16 @@ import tkinter as tk
 from tkinter import MULTIPLE, Listbox, Scrollbar, END
 from urllib.parse import urlparse
 
-def select_articles_gui(articles):
+# How often the picker checks for newly finished summaries, in milliseconds
+PREVIEW_POLL_MS = 1000
+
+def select_articles_gui(articles, preview=None):
+    """Show the multi-select picker and return the chosen articles.
+
+    ``preview`` (url -> summary or None) enables summary previews:
+    articles whose summary is ready turn green, and the summary of the
+    last clicked article is shown under the list.
+    """
     print("Presenting selection UI for articles...")  # Debug print
     selected_indices = []
 
@@ -45,6 +54,31 @@ def select_articles_gui(articles):
     btn = tk.Button(button_frame, text="OK", command=on_ok)
     btn.pack(pady=8)
 
+    if preview is not None:
+        preview_label = tk.Label(root, text="Summaries are being prepared in the background...",
+                                 wraplength=window_width - 40, justify="left", anchor="w")
+        preview_label.pack(fill="x", side="bottom", padx=12, pady=4)
+        ready = set()
+
+        def show_preview(event=None):
+            idx = listbox.index("active")
+            if idx >= len(articles):
+                return
+            summary = preview(articles[idx]['url'])
+            preview_label.config(text=summary or "Summary not ready yet.")
+
+        def poll():
+            for idx, article in enumerate(articles):
+                if idx not in ready and preview(article['url']):
+                    ready.add(idx)
+                    listbox.itemconfig(idx, foreground="dark green")
+            if listbox.index("active") in ready:
+                show_preview()
+            root.after(PREVIEW_POLL_MS, poll)
+
+        listbox.bind("<<ListboxSelect>>", show_preview)
+        root.after(PREVIEW_POLL_MS, poll)
+
     root.mainloop()
     selected = [articles[i] for i in selected_indices]
     print(f"{len(selected_indices)} articles selected.")  # Debug print (after selection)
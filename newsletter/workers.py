@@ -0,0 +1,165 @@
+import atexit
+import multiprocessing
+import os
+import time
+from queue import Empty
+from newsletter import metrics
+from newsletter.summarize import (
+    SUMMARY_WORKERS,
+    SUMMARY_THREADS_PER_WORKER,
+    MODEL_NAME,
+    generate_batch,
+    get_summarizer_and_tokenizer,
+)
+
+# How often a wait on the workers checks that they are still alive, in seconds
+RESULT_POLL_SECONDS = 1.0
+
+def _available_cores():
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+def plan_worker_layout(num_workers=None, threads_per_worker=None):
+    """Split the available cores into one contiguous slice per worker.
+
+    Returns {"workers", "threads_per_worker", "cores"} where cores holds the
+    core ids each worker is pinned to (None when there are too few cores to
+    give every worker its own slice).
+    """
+    if num_workers is None:
+        num_workers = SUMMARY_WORKERS
+    if threads_per_worker is None:
+        threads_per_worker = SUMMARY_THREADS_PER_WORKER
+    cores = _available_cores()
+    num_workers = max(1, int(num_workers))
+    if not threads_per_worker:
+        threads_per_worker = max(1, len(cores) // num_workers)
+    threads_per_worker = int(threads_per_worker)
+    if num_workers * threads_per_worker <= len(cores):
+        slices = [cores[i * threads_per_worker:(i + 1) * threads_per_worker] for i in range(num_workers)]
+    else:
+        slices = [None] * num_workers
+    return {"workers": num_workers, "threads_per_worker": threads_per_worker, "cores": slices}
+
+def _worker_main(index, device, backend, threads, cores, tasks, results):
+    import torch
+    if cores and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass
+    try:
+        summarizer, _ = get_summarizer_and_tokenizer(device, backend=backend)
+    except Exception as e:
+        results.put(("ready", index, None, f"{type(e).__name__}: {e}"))
+        return
+    print(f"Summarizer worker {index} ready ({threads} threads, cores {cores})")  # Debug print
+    results.put(("ready", index, None, None))
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        task_id, id_lists, gen_kwargs = task
+        try:
+            results.put((task_id, index, generate_batch(summarizer, id_lists, gen_kwargs), None))
+        except Exception as e:
+            results.put((task_id, index, None, f"{type(e).__name__}: {e}"))
+
+class SummarizerPool:
+    """Summarize on N processes, each holding its own copy of the model.
+
+    Every worker is limited to ``threads_per_worker`` torch threads and,
+    where the OS allows, pinned to its own slice of cores.  Batches are
+    handed out through a shared queue and gathered back in order.  The
+    pool is callable like a summarization pipeline for text prompts.
+    """
+
+    def __init__(self, device, backend, num_workers=None, threads_per_worker=None):
+        from transformers import AutoTokenizer
+        self.layout = plan_worker_layout(num_workers, threads_per_worker)
+        self.num_workers = self.layout["workers"]
+        self.tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
+        ctx = multiprocessing.get_context("spawn")
+        self._tasks = ctx.Queue()
+        self._results = ctx.Queue()
+        self._next_task = 0
+        self._processes = []
+        print(f"Starting {self.layout['workers']} summarizer workers x {self.layout['threads_per_worker']} threads...")  # Debug print
+        for index, cores in enumerate(self.layout["cores"]):
+            p = ctx.Process(
+                target=_worker_main,
+                args=(index, device, backend, self.layout["threads_per_worker"], cores, self._tasks, self._results),
+                name=f"summarizer-worker-{index}",
+                daemon=True,
+            )
+            p.start()
+            self._processes.append(p)
+        atexit.register(self.close)
+        for _ in self._processes:
+            try:
+                _, index, _, error = self._get_result()
+            except RuntimeError:
+                self.close()
+                raise
+            if error:
+                self.close()
+                raise RuntimeError(f"Summarizer worker {index} failed to start: {error}")
+
+    def _check_workers(self):
+        dead = [p for p in self._processes if not p.is_alive()]
+        if dead:
+            # The dead worker's task is lost, so the pool cannot be trusted from here on
+            raise RuntimeError(", ".join(f"{p.name} exited with code {p.exitcode}" for p in dead))
+
+    def _get_result(self):
+        """Wait for the next result, raising RuntimeError if a worker has died (e.g. killed for memory)."""
+        while True:
+            try:
+                return self._results.get(timeout=RESULT_POLL_SECONDS)
+            except Empty:
+                self._check_workers()
+
+    def generate_batches(self, batches, gen_kwargs):
+        """Run each batch of token id lists on whichever worker is free; results keep batch order.
+
+        Raises RuntimeError if a worker fails or dies, so callers can fall back.
+        """
+        self._check_workers()
+        first = self._next_task
+        for offset, id_lists in enumerate(batches):
+            self._tasks.put((first + offset, id_lists, gen_kwargs))
+        self._next_task += len(batches)
+        outputs = [None] * len(batches)
+        with metrics.span("generation", batches=len(batches), workers=len(self._processes)):
+            for _ in batches:
+                task_id, _, output, error = self._get_result()
+                if error:
+                    raise RuntimeError(f"Summarizer worker failed: {error}")
+                outputs[task_id - first] = output
+        return outputs
+
+    def __call__(self, texts, max_length=142, min_length=56, do_sample=False, num_beams=None, **kwargs):
+        if isinstance(texts, str):
+            texts = [texts]
+        limit = 1024 - self.tokenizer.num_special_tokens_to_add(pair=False)
+        id_lists = [self.tokenizer(t, add_special_tokens=False, truncation=True, max_length=limit)["input_ids"] for t in texts]
+        gen_kwargs = {"max_length": max_length, "min_length": min_length, "do_sample": do_sample}
+        if num_beams is not None:
+            gen_kwargs["num_beams"] = num_beams
+        outputs = self.generate_batches([id_lists], gen_kwargs)[0]
+        return [{"summary_text": self.tokenizer.decode(ids, skip_special_tokens=True)} for ids in outputs]
+
+    def close(self):
+        if not self._processes:
+            return
+        for _ in self._processes:
+            self._tasks.put(None)
+        deadline = time.monotonic() + 10
+        for p in self._processes:
+            p.join(timeout=max(0, deadline - time.monotonic()))
+            if p.is_alive():
+                p.terminate()
+        self._processes = []
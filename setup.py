@@ -3,11 +3,12 @@ from setuptools import setup, find_packages
 setup(
     name="newsletter",
     version="0.1.0",
-    packages=find_packages(),
+    packages=find_packages(exclude=["benchmarks", "benchmarks.*"]),
     install_requires=[],
     entry_points={
         "console_scripts": [
             "newsletter=newsletter.main:main",
+            "newsletter-daemon=newsletter.daemon:main",
         ],
     },
 )